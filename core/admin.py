@@ -1,22 +1,160 @@
+from datetime import date, datetime, time, timedelta
 
+from django.conf import settings
 from django.contrib import admin
-from .models import Category, Product, Sale, SaleItem
+from django.contrib.admin.filters import DateFieldListFilter
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .forms import ProductForm
+from .models import Category, Product, Sale, SaleItem, StockMovement
+from . import stock
+
+
+class EstimatedCountPaginator(Paginator):
+    # An unfiltered changelist on Postgres counts from the planner's estimate instead of COUNT(*) over the table
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        connection = connections[qs.db]
+        if connection.vendor == 'postgresql' and not qs.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [qs.model._meta.db_table])
+                row = cursor.fetchone()
+            # reltuples is -1 until the table has been analyzed
+            if row and row[0] >= settings.ADMIN_ESTIMATED_COUNT_ABOVE:
+                return row[0]
+        return super().count
+
+
+class DateRangeFilter(DateFieldListFilter):
+    """The stock date presets plus a from/to form; every choice is a plain range on the (indexed) column."""
+
+    template = 'admin/core/date_range_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.param_from = f'{field_path}__from'
+        self.param_to = f'{field_path}__to'
+        self.value_from = params.get(self.param_from, [''])[-1]
+        self.value_to = params.get(self.param_to, [''])[-1]
+        super().__init__(field, request, params, model, model_admin, field_path)
+        for p in (self.param_from, self.param_to):
+            self.used_parameters.pop(p, None)
+
+    def expected_parameters(self):
+        return super().expected_parameters() + [self.param_from, self.param_to]
+
+    def _bound(self, value, days):
+        day = date.fromisoformat(value) + timedelta(days=days)
+        if isinstance(self.field, models.DateTimeField):
+            return timezone.make_aware(datetime.combine(day, time.min))
+        return day
+
+    def queryset(self, request, queryset):
+        bounds = {}
+        try:
+            if self.value_from:
+                bounds[self.lookup_kwarg_since] = self._bound(self.value_from, 0)
+            if self.value_to:
+                bounds[self.lookup_kwarg_until] = self._bound(self.value_to, 1)
+        except ValueError as exc:
+            raise IncorrectLookupParameters(exc)
+        return super().queryset(request, queryset).filter(**bounds)
+
+    def choices(self, changelist):
+        # Other active filters ride along as hidden inputs in the from/to form
+        self.preserved = [
+            (key, value)
+            for key, values in changelist.filter_params.items() if not key.startswith(self.field_generic)
+            for value in values
+        ]
+        return super().choices(changelist)
+
+
+class FastChangelist:
+    # Shared settings for the big tables: no second COUNT(*) and estimated totals on Postgres
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('id','name')
+    search_fields = ('name',)
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('id','name','category','price','stock','is_active')
+class ProductAdmin(FastChangelist, admin.ModelAdmin):
+    form = ProductForm
+    list_display = ('id','name','sku','category','price','stock','reorder_level','is_active')
     list_filter = ('category','is_active')
-    search_fields = ('name',)
+    list_select_related = ('category',)
+    search_fields = ('name','sku')
+    autocomplete_fields = ('category',)
+    readonly_fields = ('ledger_stock',)
+
+    @admin.display(description='Ledger stock')
+    def ledger_stock(self, obj):
+        # Snapshot plus recent movements; differs from stock only if something bypassed the ledger
+        return stock.on_hand([obj.pk])[obj.pk] if obj.pk else '-'
+
+    def save_model(self, request, obj, form, change):
+        # Route stock edits through the ledger as a delta from what the form showed
+        stock.save_product(obj, form.previous_stock() if change else 0, user=request.user, note='Admin edit')
 
 class SaleItemInline(admin.TabularInline):
+    # Line items are history (stock, ledger and rollups were written at checkout), so they are shown read-only
     model = SaleItem
     extra = 0
+    fields = ('product','quantity','price')
+    readonly_fields = fields
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Sale)
-class SaleAdmin(admin.ModelAdmin):
+class SaleAdmin(FastChangelist, admin.ModelAdmin):
     list_display = ('id','seller','created_at','total')
+    list_select_related = ('seller',)
+    list_filter = (('created_at', DateRangeFilter),)
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at','-id')
+    search_fields = ('=id','seller__username')
+    autocomplete_fields = ('seller',)
     inlines = [SaleItemInline]
+
+@admin.register(SaleItem)
+class SaleItemAdmin(FastChangelist, admin.ModelAdmin):
+    list_display = ('id','sale','product','quantity','price')
+    list_select_related = ('sale','product')
+    list_filter = (('sale__created_at', DateRangeFilter),)
+    search_fields = ('=sale__id','product__name','product__sku')
+    raw_id_fields = ('sale','product')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(StockMovement)
+class StockMovementAdmin(FastChangelist, admin.ModelAdmin):
+    list_display = ('id','product','kind','quantity','sale','user','created_at')
+    list_filter = ('kind', ('created_at', DateRangeFilter))
+    list_select_related = ('product','sale','user')
+    raw_id_fields = ('product','sale','user')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,30 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _in_worker(fn):
+    # Each worker thread has its own DB connection; honour CONN_MAX_AGE like a request would
+    def run():
+        close_old_connections()
+        try:
+            return fn()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_queries(queries):
+    """
+    Run ``{name: callable}`` ORM queries concurrently and return ``{name: result}``.
+
+    Django's own async ORM methods funnel every query onto one shared thread,
+    so independent aggregates would still run back to back. Each callable here
+    gets its own worker thread, and therefore its own database connection.
+    """
+    names = list(queries)
+    results = await asyncio.gather(
+        *[sync_to_async(_in_worker(queries[name]), thread_sensitive=False)() for name in names]
+    )
+    return dict(zip(names, results))
@@ -0,0 +1,126 @@
+import gzip
+import os
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .cache import bump, SALES
+from .models import ArchivedPeriod, Sale, SaleItem, StockMovement
+from . import exports
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def month_end(month):
+    """Last day of the month starting on ``month``."""
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def archived_q(field='day'):
+    """``Q`` matching dates inside archived months, for excluding them from raw-row comparisons."""
+    q = Q()
+    for month in ArchivedPeriod.objects.values_list('month', flat=True):
+        q |= Q(**{f'{field}__gte': month, f'{field}__lte': month_end(month)})
+    return q
+
+
+def closed_months(keep_months=12, today=None):
+    """Months with live sales that ended more than ``keep_months`` full months ago, oldest first."""
+    today = today or timezone.localdate()
+    cutoff = today.replace(day=1)
+    for _ in range(keep_months):
+        cutoff = (cutoff - timedelta(days=1)).replace(day=1)
+    cutoff_at = timezone.make_aware(datetime.combine(cutoff, time.min))
+    archived = set(ArchivedPeriod.objects.values_list('month', flat=True))
+    months = Sale.objects.filter(created_at__lt=cutoff_at).dates('created_at', 'month')
+    return [m for m in months if m not in archived]
+
+
+def _write(path, rows):
+    # Write to a temporary name and rename, so a crash never leaves a truncated archive behind
+    written = -1  # the header row
+    tmp = f'{path}.tmp'
+    with gzip.open(tmp, 'wt', newline='') as target:
+        for chunk in exports.csv_stream(rows):
+            target.write(chunk)
+            written += 1
+    os.replace(tmp, path)
+    return written
+
+
+DELETE_BATCH = 1000
+
+
+def _delete_sales(sale_ids, using):
+    """
+    Delete the sales and their line items with plain SQL, ``DELETE_BATCH`` ids at a time.
+
+    Deliberately not ``QuerySet.delete()``: it would load every row and send
+    per-row signals, and those only exist to keep rollups, counters and
+    cache versions in step with live sales, which archiving must leave alone.
+    Returns the number of sales and line items deleted.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    deleted_sales = deleted_items = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(sale_ids), DELETE_BATCH):
+            batch = sale_ids[start:start + DELETE_BATCH]
+            marks = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {quote(SaleItem._meta.db_table)} WHERE {quote("sale_id")} IN ({marks})', batch)
+            deleted_items += cursor.rowcount
+            cursor.execute(f'DELETE FROM {quote(Sale._meta.db_table)} WHERE {quote("id")} IN ({marks})', batch)
+            deleted_sales += cursor.rowcount
+    return deleted_sales, deleted_items
+
+
+def archive_month(month, directory=None):
+    """
+    Dump one month's sales and line items to gzipped CSV, then delete the raw
+    rows. The daily, per-seller and per-product rollups are left in place, so
+    reports and the dashboard still cover archived months.
+    """
+    directory = directory or settings.ARCHIVE_DIR
+    os.makedirs(directory, exist_ok=True)
+    filters = exports.ExportFilters(start=month, end=month_end(month))
+    sales = Sale.objects.filter(**filters.created_range())
+
+    with transaction.atomic():
+        if ArchivedPeriod.objects.select_for_update().filter(month=month).exists():
+            raise ArchiveError(f'{month:%Y-%m} is already archived')
+        stats = sales.aggregate(count=Count('id'), total=Sum('total'))
+        item_count = SaleItem.objects.filter(sale__in=sales).count()
+
+        sales_file = os.path.join(directory, f'sales-{month:%Y-%m}.csv.gz')
+        items_file = os.path.join(directory, f'items-{month:%Y-%m}.csv.gz')
+        if _write(sales_file, exports.sales_rows(filters)) != stats['count']:
+            raise ArchiveError(f'{month:%Y-%m}: sales changed while archiving')
+        if _write(items_file, exports.item_rows(filters)) != item_count:
+            raise ArchiveError(f'{month:%Y-%m}: line items changed while archiving')
+
+        # The ledger keeps its movements, just without the sale they pointed at
+        StockMovement.objects.filter(sale__in=sales).update(sale=None)
+        sale_ids = list(sales.order_by('id').values_list('id', flat=True))
+        if _delete_sales(sale_ids, router.db_for_write(Sale)) != (stats['count'], item_count):
+            raise ArchiveError(f'{month:%Y-%m}: sales changed while archiving')
+
+        period = ArchivedPeriod.objects.create(
+            month=month,
+            sales=stats['count'],
+            items=item_count,
+            total=stats['total'] or 0,
+            sales_file=sales_file,
+            items_file=items_file,
+        )
+        transaction.on_commit(lambda: bump(SALES))
+    return period
+
+
+def parse_month(value):
+    """``YYYY-MM`` to the first day of that month; raises ValueError."""
+    return date.fromisoformat(f'{value}-01')
@@ -0,0 +1,40 @@
+import copy
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.db import transaction
+
+from .cache import bump, versions, USERS
+from .lookup import LRUCache
+
+_users = LRUCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` whose per-request ``get_user()`` is served from a small
+    per-process cache instead of a ``SELECT`` on every request.
+
+    Entries are tagged with the shared ``USERS`` cache version, which any
+    user save or delete bumps, so edits in one process evict the entry in
+    all of them. That only holds when the cache itself is shared, so settings
+    enable this backend only with ``CACHE_SHARED``.
+    """
+
+    def get_user(self, user_id):
+        # Read the version before the row, so a concurrent edit can only make the entry look older
+        version = versions(USERS)[0]
+        hit = _users.get(user_id)
+        if hit is not None and hit[1] == version:
+            return copy.copy(hit[0])
+        user = super().get_user(user_id)
+        if user is None:
+            _users.pop(user_id)
+            return None
+        _users.set(user_id, (copy.copy(user), version))
+        return user
+
+
+def invalidate_user(user_id):
+    """Drop ``user_id`` here and make every process refetch its users, once the edit has committed."""
+    transaction.on_commit(lambda: (_users.pop(user_id), bump(USERS)))
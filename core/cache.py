@@ -0,0 +1,87 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+# Namespaces whose version is bumped on writes; cached values embed the versions they were built from
+SALES = 'sales'
+CATALOG = 'catalog'
+USERS = 'users'
+# Product fields shown by a scan (price, name, active status); bumped by edits and imports, not by checkout
+PRODUCTS = 'products'
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _version_key(namespace):
+    return f'ver:{namespace}'
+
+
+def versions(*namespaces):
+    keys = [_version_key(ns) for ns in namespaces]
+    found = cache.get_many(keys)
+    result = []
+    for ns, key in zip(namespaces, keys):
+        if key not in found:
+            # Seed from the clock so a culled version key can never roll back onto stale entries
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+        result.append(found[key])
+    return result
+
+
+def bump(*namespaces):
+    for ns in namespaces:
+        try:
+            cache.incr(_version_key(ns))
+        except ValueError:
+            cache.add(_version_key(ns), time.time_ns(), timeout=None)
+
+
+def _count(hit):
+    with _lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def stats():
+    with _lock:
+        return dict(_stats)
+
+
+def _key(name, depends):
+    return f'{name}:' + '.'.join(map(str, versions(*depends)))
+
+
+def get_or_build(name, depends, build, ttl=None):
+    """
+    Return the cached value for ``name`` or call ``build()`` and store it.
+
+    ``depends`` lists the namespaces the value is derived from; bumping any of
+    them makes the old entry unreachable, and the TTL/size limits of the
+    configured backend evict it.
+    """
+    key = _key(name, depends)
+    value = cache.get(key)
+    if value is not None:
+        _count(True)
+        return value
+    _count(False)
+    value = build()
+    cache.set(key, value, settings.CACHE_TTL if ttl is None else ttl)
+    return value
+
+
+async def aget_or_build(name, depends, build, ttl=None):
+    """Async ``get_or_build``; ``build`` is a coroutine function."""
+    key = await sync_to_async(_key)(name, depends)
+    value = await cache.aget(key)
+    if value is not None:
+        _count(True)
+        return value
+    _count(False)
+    value = await build()
+    await cache.aset(key, value, settings.CACHE_TTL if ttl is None else ttl)
+    return value
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .cache import bump, CATALOG, SALES
+from .models import Product, Sale, SaleItem
+from . import events, lookup, rollups, stock, valuation
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class UnknownProduct(CheckoutError):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f'Unknown or inactive product(s): {", ".join(map(str, self.product_ids))}')
+
+
+class InsufficientStock(CheckoutError):
+    def __init__(self, product):
+        self.product = product
+        super().__init__(f'Insufficient stock for {product.name}')
+
+
+def merge_lines(lines):
+    # Collapse repeated products into one line so each row is touched once
+    basket = OrderedDict()
+    for pid, qty in lines:
+        if qty > 0:
+            basket[int(pid)] = basket.get(int(pid), 0) + int(qty)
+    return basket
+
+
+def checkout(seller, lines, client_uuid=None):
+    """
+    Record a sale for ``lines`` (an iterable of ``(product_id, quantity)``).
+
+    The whole basket costs a fixed number of queries: one locking SELECT,
+    one conditional stock UPDATE, one Sale INSERT, one bulk SaleItem INSERT,
+    one bulk ledger INSERT, the constant-cost rollup bumps in ``core.rollups``
+    and the two-query stock valuation update in ``core.valuation``.
+    Raises ``CheckoutError`` and rolls back if any line cannot be filled.
+    ``client_uuid`` is the till's idempotency key for offline-synced sales.
+    """
+    basket = merge_lines(lines)
+    if not basket:
+        raise CheckoutError('No items selected')
+
+    with transaction.atomic():
+        # Lock in primary key order so overlapping baskets can't deadlock each other
+        products = (
+            Product.objects.select_for_update().filter(pk__in=basket.keys(), is_active=True).order_by('pk').in_bulk()
+        )
+        missing = set(basket) - set(products)
+        if missing:
+            raise UnknownProduct(missing)
+        for pid, qty in basket.items():
+            if products[pid].stock < qty:
+                raise InsufficientStock(products[pid])
+
+        # Single guarded decrement; a row only matches if it still has enough stock
+        guard = Q()
+        for pid, qty in basket.items():
+            guard |= Q(pk=pid, stock__gte=qty)
+        updated = Product.objects.filter(guard).update(
+            stock=Case(
+                *[When(pk=pid, then=F('stock') - Value(qty)) for pid, qty in basket.items()],
+                output_field=IntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+        if updated != len(basket):
+            raise CheckoutError('Stock changed during checkout, please retry')
+
+        total = sum(products[pid].price * qty for pid, qty in basket.items())
+        sale = Sale.objects.create(seller=seller, total=total, client_uuid=client_uuid)
+        SaleItem.objects.bulk_create([
+            SaleItem(sale=sale, product=products[pid], quantity=qty, price=products[pid].price)
+            for pid, qty in basket.items()
+        ])
+        stock.record_sale(sale, basket)
+        rollups.record_sale(sale)
+        rollups.record_items(sale, basket)
+        valuation.record_sale(products, basket)
+        events.notify_sale(sale)
+        # Bulk writes skip model signals, so invalidate cached stats explicitly
+        transaction.on_commit(lambda: bump(SALES, CATALOG))
+        transaction.on_commit(lambda: lookup.invalidate(*basket))
+    return sale
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+# Runs in a fresh interpreter: build the WSGI app, serve one request, report timings as JSON
+FIRST_REQUEST = '''
+import io, json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory.settings')
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+ready = time.perf_counter()
+statuses = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    'wsgi.url_scheme': 'http',
+}
+body = b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+done = time.perf_counter()
+print(json.dumps({
+    'done_at': time.time(), 'setup_ms': (ready - started) * 1000, 'request_ms': (done - ready) * 1000,
+    'status': statuses[0], 'bytes': len(body),
+}))
+'''
+
+
+def _run(args):
+    return subprocess.run(
+        [sys.executable, *args], cwd=settings.BASE_DIR, env=dict(os.environ), capture_output=True, text=True,
+    )
+
+
+def first_request(url):
+    """
+    Time one cold start in a new interpreter. ``ttfr_ms`` runs from process
+    spawn to the first response body, interpreter startup included.
+    """
+    spawned = time.time()
+    proc = _run(['-c', FIRST_REQUEST, url])
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'child process failed')
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['ttfr_ms'] = (result.pop('done_at') - spawned) * 1000
+    return result
+
+
+def import_times(url):
+    """``[(module, self_us, cumulative_us)]`` from ``python -X importtime`` over one cold start, in import order."""
+    proc = _run(['-X', 'importtime', '-c', FIRST_REQUEST, url])
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'child process failed')
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, connections
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import DailySales, LOW_STOCK, Product, Sale, SaleItem
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'inventory_sales'
+QUEUE_SIZE = 100
+
+
+def notify_sale(sale):
+    """Announce a sale to listeners; on Postgres NOTIFY is only delivered if the surrounding transaction commits."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, str(sale.pk)])
+
+
+def build_events(sale_ids):
+    """``[(event, data)]`` for a batch of committed sales, in a fixed number of queries."""
+    sales = list(
+        Sale.objects.filter(pk__in=sale_ids)
+        .select_related('seller')
+        .prefetch_related(Prefetch('items', queryset=SaleItem.objects.select_related('product').order_by('pk')))
+        .order_by('pk')
+    )
+    if not sales:
+        return []
+    events = [
+        ('sale', {
+            'id': sale.pk,
+            'seller': str(sale.seller) if sale.seller else '',
+            'created_at': timezone.localtime(sale.created_at).isoformat(),
+            'total': sale.total,
+            'items': [{'product': it.product.name, 'quantity': it.quantity} for it in sale.items.all()],
+        })
+        for sale in sales
+    ]
+    today = DailySales.objects.filter(day=timezone.localdate()).values('day', 'count', 'total').first()
+    if today:
+        events.append(('daily_total', today))
+    product_ids = {it.product_id for sale in sales for it in sale.items.all()}
+    low = Product.objects.filter(LOW_STOCK, pk__in=product_ids).order_by('name')
+    events.extend(('low_stock', row) for row in low.values('id', 'name', 'stock', 'reorder_level'))
+    return events
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+class Subscription:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def offer(self, message):
+        # Runs on the subscriber's event loop; a client too slow to keep up loses events rather than memory
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+
+
+class Broadcaster:
+    """
+    One source thread per process feeds every connected client.
+
+    The thread LISTENs on Postgres, or polls for new sale ids on other
+    databases, builds each batch of events once and hands the formatted
+    messages to every subscriber's queue. It starts with the first
+    subscriber and stops after the last one leaves.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        sub = Subscription()
+        with self._lock:
+            self._subscribers.add(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sse-broadcaster', daemon=True)
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def _keep_running(self):
+        with self._lock:
+            if not self._subscribers:
+                self._thread = None
+                return False
+            return True
+
+    def publish(self, sale_ids):
+        messages = [format_event(event, data) for event, data in build_events(sale_ids)]
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            for message in messages:
+                sub.loop.call_soon_threadsafe(sub.offer, message)
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    if connection.vendor == 'postgresql':
+                        self._listen()
+                    else:
+                        self._poll()
+                    return
+                except DatabaseError:
+                    logger.exception('Event source lost its database connection; retrying')
+                    connection.close()
+                    time.sleep(settings.EVENTS_POLL_SECONDS)
+                    if not self._keep_running():
+                        return
+        finally:
+            connections.close_all()
+
+    def _poll(self):
+        watermark = Sale.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        while self._keep_running():
+            time.sleep(settings.EVENTS_POLL_SECONDS)
+            ids = list(Sale.objects.filter(pk__gt=watermark).order_by('pk').values_list('pk', flat=True)[:500])
+            if ids:
+                watermark = ids[-1]
+                self.publish(ids)
+
+    def _listen(self):
+        connection.ensure_connection()
+        connection.set_autocommit(True)
+        raw = connection.connection
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        while self._keep_running():
+            if hasattr(raw, 'poll'):  # psycopg2
+                if select.select([raw], [], [], settings.EVENTS_POLL_SECONDS) == ([], [], []):
+                    continue
+                raw.poll()
+                ids = [int(n.payload) for n in raw.notifies]
+                raw.notifies.clear()
+            else:  # psycopg 3
+                ids = [int(n.payload) for n in raw.notifies(timeout=settings.EVENTS_POLL_SECONDS, stop_after=500)]
+            if ids:
+                self.publish(ids)
+
+
+broadcaster = Broadcaster()
+
+
+async def stream(keepalive=15):
+    """Async iterator of SSE messages for one client, sharing the process-wide broadcaster."""
+    sub = broadcaster.subscribe()
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                yield await asyncio.wait_for(sub.queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+    finally:
+        broadcaster.unsubscribe(sub)
@@ -0,0 +1,199 @@
+import csv
+import zipfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Sale, SaleItem, DailySales, DailySellerSales
+
+CHUNK_SIZE = 2000
+CENTS = Decimal('0.01')
+KINDS = ('sales', 'items', 'daily')
+
+
+class ExportFilters:
+    def __init__(self, start=None, end=None, seller=None):
+        self.start = start
+        self.end = end
+        self.seller = seller
+
+    @classmethod
+    def parse(cls, params):
+        """Build filters from a dict-like of strings; raises ValueError on bad input."""
+        start = date.fromisoformat(params['start']) if params.get('start') else None
+        end = date.fromisoformat(params['end']) if params.get('end') else None
+        seller = int(params['seller']) if params.get('seller') else None
+        return cls(start, end, seller)
+
+    def created_range(self, field='created_at'):
+        # Whole local days, expressed as a half-open datetime range so the created_at index is used
+        lookup = {}
+        if self.start:
+            lookup[f'{field}__gte'] = timezone.make_aware(datetime.combine(self.start, time.min))
+        if self.end:
+            lookup[f'{field}__lt'] = timezone.make_aware(datetime.combine(self.end + timedelta(days=1), time.min))
+        return lookup
+
+
+def sales_rows(filters, using=None):
+    qs = Sale.objects.using(using).filter(**filters.created_range())
+    if filters.seller:
+        qs = qs.filter(seller_id=filters.seller)
+    yield ('sale_id', 'created_at', 'seller', 'total')
+    rows = qs.order_by('created_at', 'id').values_list('id', 'created_at', 'seller__username', 'total')
+    for sale_id, created_at, seller, total in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield (sale_id, timezone.localtime(created_at).isoformat(), seller or '', total)
+
+
+def item_rows(filters, using=None):
+    qs = SaleItem.objects.using(using).filter(**filters.created_range('sale__created_at'))
+    if filters.seller:
+        qs = qs.filter(sale__seller_id=filters.seller)
+    yield ('sale_id', 'created_at', 'seller', 'product_id', 'sku', 'product', 'quantity', 'price', 'line_total')
+    rows = qs.order_by('sale__created_at', 'sale_id', 'id').values_list(
+        'sale_id', 'sale__created_at', 'sale__seller__username', 'product_id', 'product__sku', 'product__name',
+        'quantity', 'price',
+    )
+    for sale_id, created_at, seller, pid, sku, name, qty, price in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield (sale_id, timezone.localtime(created_at).isoformat(), seller or '', pid, sku or '', name, qty, price, qty * price)
+
+
+def daily_rows(filters, using=None):
+    # Served from the rollups, so even years of history is one small scan
+    qs = DailySellerSales.objects.using(using).filter(seller_id=filters.seller) if filters.seller else DailySales.objects.using(using)
+    if filters.start:
+        qs = qs.filter(day__gte=filters.start)
+    if filters.end:
+        qs = qs.filter(day__lte=filters.end)
+    yield ('day', 'sales', 'total')
+    rows = qs.values('day').order_by('day').annotate(c=Sum('count'), t=Sum('total')).values_list('day', 'c', 't')
+    for day, count, total in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield (day.isoformat(), count, (total or Decimal(0)).quantize(CENTS))
+
+
+ROWS = {'sales': sales_rows, 'items': item_rows, 'daily': daily_rows}
+
+
+def rows_for(kind, filters, using=None):
+    return ROWS[kind](filters, using)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_stream(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _Buffer:
+    # Write-only sink for zipfile; the stream hands out whatever was written since the last take()
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/></Relationships>'
+    ),
+}
+
+
+def _cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def xlsx_stream(rows, sheet='Export', rows_per_flush=1000):
+    """
+    Stream a single-sheet XLSX workbook without holding it in memory.
+
+    Cells are inline strings or plain numbers, so no shared-strings table has to
+    be built up front. Excel opens at most 1,048,576 rows; use CSV beyond that.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in _XLSX_PARTS.items():
+            zf.writestr(name, body.replace('{sheet}', escape(sheet)))
+        yield buffer.take()
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet_file:
+            sheet_file.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            pending = []
+            for row in rows:
+                pending.append('<row>' + ''.join(_cell(v) for v in row) + '</row>')
+                if len(pending) >= rows_per_flush:
+                    sheet_file.write(''.join(pending).encode())
+                    pending.clear()
+                    yield buffer.take()
+            sheet_file.write(''.join(pending).encode() + b'</sheetData></worksheet>')
+    yield buffer.take()
+
+
+FORMATS = {
+    'csv': ('text/csv', lambda rows, kind: (chunk.encode() for chunk in csv_stream(rows))),
+    'xlsx': (
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        lambda rows, kind: xlsx_stream(rows, sheet=kind.title()),
+    ),
+}
+
+
+def export_stream(kind, filters, fmt, using=None):
+    """
+    Return ``(content_type, iterator of bytes)`` for one export.
+
+    The rows are read lazily, after the view has returned, so the database is
+    passed as ``using`` rather than taken from the request's routing.
+    """
+    content_type, render = FORMATS[fmt]
+    return content_type, render(rows_for(kind, filters, using), kind)
@@ -13,12 +13,28 @@ class CategoryForm(forms.ModelForm):
         fields = ['name']
 
 class ProductForm(forms.ModelForm):
+    # Stock level the editor was shown; the save applies the difference so concurrent sales are kept
+    stock_seen = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
     class Meta:
         model = Product
-        fields = ['name','category','price','stock','is_active']
+        fields = ['name','sku','category','price','stock','reorder_level','is_active']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['stock_seen'].initial = self.instance.stock if self.instance.pk else 0
+
+    def previous_stock(self):
+        seen = self.cleaned_data.get('stock_seen')
+        return self.initial.get('stock', 0) if seen is None else seen
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV or JSON with columns sku, name, category, price, stock, is_active")
+    dry_run = forms.BooleanField(required=False, initial=True, help_text="Show the changes without saving")
 
 class UserForm(forms.ModelForm):
     password = forms.CharField(required=False, widget=forms.PasswordInput, help_text="Leave blank to keep current password")
     class Meta:
         model = User
-        fields = ['username','first_name','last_name','email','is_staff','is_active','password']
+        # password is a plain form field, never copied onto the instance: a blank one must keep the current hash
+        fields = ['username','first_name','last_name','email','is_staff','is_active']
@@ -0,0 +1,282 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .cache import bump, CATALOG, PRODUCTS
+from .models import Category, Product, StockMovement
+from . import lookup, valuation
+
+FIELDS = ('sku', 'name', 'category', 'price', 'stock', 'is_active')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self, max_changes=None):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []   # (line, message)
+        self.changes = []  # dry runs only: (line, 'create'|'update', key, {field: (old, new)})
+        self.changes_omitted = 0
+        self.max_changes = max_changes
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add_change(self, *change):
+        # Only the first max_changes are kept, so a dry run of a huge file stays small
+        if self.max_changes is None or len(self.changes) < self.max_changes:
+            self.changes.append(change)
+        else:
+            self.changes_omitted += 1
+
+
+def iter_csv(fh):
+    for line, row in enumerate(csv.DictReader(fh), start=2):
+        yield line, row
+
+
+def iter_json(fh, read_size=65536):
+    """Yield ``(record number, object)`` from a JSON array or JSON Lines without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf, pos, count, eof = '', 0, 0, False
+    while True:
+        # Skip separators between array elements / lines
+        while pos < len(buf) and buf[pos] in ' \t\r\n,[]':
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            buf, pos = fh.read(read_size), 0
+            eof = not buf
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as exc:
+            if eof:
+                raise RowError(f'Invalid JSON in record {count + 1}: {exc.msg}')
+            more = fh.read(read_size)
+            buf, pos = buf[pos:] + more, 0
+            eof = not more
+            continue
+        count += 1
+        pos = end
+        yield count, obj
+
+
+def _clean(row):
+    if not isinstance(row, dict):
+        raise RowError('Expected an object')
+    row = {k.strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+    unknown = set(row) - set(FIELDS)
+    if unknown:
+        raise RowError(f'Unknown column(s): {", ".join(sorted(unknown))}')
+    data = {}
+    data['sku'] = str(row['sku']) if row.get('sku') not in (None, '') else None
+    data['name'] = str(row['name']) if row.get('name') not in (None, '') else None
+    if not data['sku'] and not data['name']:
+        raise RowError('Either sku or name is required')
+    if data['name'] and len(data['name']) > 200:
+        raise RowError('name is longer than 200 characters')
+    if data['sku'] and len(data['sku']) > 64:
+        raise RowError('sku is longer than 64 characters')
+    if 'category' in row:
+        data['category'] = str(row['category']) if row['category'] not in (None, '') else None
+    if row.get('price') not in (None, ''):
+        try:
+            price = Decimal(str(row['price']))
+        except InvalidOperation:
+            raise RowError(f'Invalid price {row["price"]!r}')
+        if price < 0 or price != price.quantize(Decimal('0.01')) or price >= Decimal('1e8'):
+            raise RowError(f'Invalid price {row["price"]!r}')
+        data['price'] = price.quantize(Decimal('0.01'))
+    if row.get('stock') not in (None, ''):
+        try:
+            stock = int(row['stock'])
+        except (TypeError, ValueError):
+            raise RowError(f'Invalid stock {row["stock"]!r}')
+        if stock < 0:
+            raise RowError('stock cannot be negative')
+        data['stock'] = stock
+    if row.get('is_active') not in (None, ''):
+        value = row['is_active']
+        if isinstance(value, bool):
+            data['is_active'] = value
+        elif str(value).lower() in TRUE_VALUES:
+            data['is_active'] = True
+        elif str(value).lower() in FALSE_VALUES:
+            data['is_active'] = False
+        else:
+            raise RowError(f'Invalid is_active {value!r}')
+    return data
+
+
+def _chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_products(records, dry_run=False, chunk_size=1000, user=None, progress=None, max_changes=1000):
+    """
+    Upsert products from ``(line, row)`` records, ``chunk_size`` rows per transaction.
+
+    Rows match existing products by sku, or by name when they have no sku.
+    Stock values are absolute targets; the difference to the current level is
+    written to the stock ledger. With ``dry_run`` nothing is written and
+    ``result.changes`` lists the first ``max_changes`` of what would happen.
+    """
+    result = ImportResult(max_changes)
+    try:
+        for chunk in _chunked(records, chunk_size):
+            valid = []
+            for line, row in chunk:
+                result.rows += 1
+                try:
+                    valid.append((line, _clean(row)))
+                except RowError as exc:
+                    result.errors.append((line, str(exc)))
+            if valid:
+                _apply_chunk_or_report(valid, result, dry_run, user)
+            if progress:
+                progress(result)
+    except RowError as exc:
+        # Unreadable file: rows of the chunk being read are not applied
+        result.errors.append((result.rows + 1, f'{exc}; import stopped'))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        result.errors.append((result.rows + 1, f'Unreadable file, expected UTF-8 CSV or JSON ({exc}); import stopped'))
+    result.errors.sort()
+    return result
+
+
+def _apply_chunk_or_report(rows, result, dry_run, user):
+    counts = (result.created, result.updated, result.unchanged)
+    try:
+        _apply_chunk(rows, result, dry_run, user)
+    except IntegrityError as exc:
+        # A concurrent write took one of the chunk's skus; the whole chunk was rolled back
+        result.created, result.updated, result.unchanged = counts
+        result.errors.append((
+            rows[0][0], f'Lines {rows[0][0]}-{rows[-1][0]} not applied, they conflict with another write ({exc}); import them again',
+        ))
+
+
+def _apply_chunk(rows, result, dry_run, user):
+    with transaction.atomic():
+        cat_names = {r['category'] for _, r in rows if r.get('category')}
+        categories = {c.name: c for c in Category.objects.filter(name__in=cat_names)}
+        missing_cats = cat_names - set(categories)
+        if missing_cats and not dry_run:
+            Category.objects.bulk_create([Category(name=n) for n in missing_cats], ignore_conflicts=True)
+            categories = {c.name: c for c in Category.objects.filter(name__in=cat_names)}
+
+        skus = {r['sku'] for _, r in rows if r['sku']}
+        names = {r['name'] for _, r in rows if not r['sku']}
+        existing = Product.objects.select_for_update().filter(sku__in=skus) if skus else Product.objects.none()
+        by_sku = {p.sku: p for p in existing}
+        by_name = {}
+        if names:
+            for p in Product.objects.select_for_update().filter(name__in=names):
+                by_name.setdefault(p.name, []).append(p)
+
+        to_create, to_update, movements, seen = [], {}, [], set()
+        change = valuation.changes()
+        now = timezone.now()
+        for line, row in rows:
+            key = row['sku'] or row['name']
+            if key in seen:
+                result.errors.append((line, f'Duplicate row for {key!r} in the same chunk'))
+                continue
+            seen.add(key)
+            if row['sku']:
+                product = by_sku.get(row['sku'])
+            else:
+                matches = by_name.get(row['name'], [])
+                if len(matches) > 1:
+                    result.errors.append((line, f'Name {row["name"]!r} matches {len(matches)} products; add a sku'))
+                    continue
+                product = matches[0] if matches else None
+
+            category = None
+            if row.get('category'):
+                category = categories.get(row['category']) or Category(name=row['category'])
+
+            if product is None:
+                if not row['name'] or 'price' not in row:
+                    result.errors.append((line, 'New products need name and price'))
+                    continue
+                product = Product(
+                    sku=row['sku'], name=row['name'], price=row['price'], category=category,
+                    is_active=row.get('is_active', True), stock=row.get('stock', 0),
+                )
+                to_create.append(product)
+                result.created += 1
+                if dry_run:
+                    result.add_change(line, 'create', key, {
+                        f: (None, getattr(product, f) if f != 'category' else row.get('category'))
+                        for f in FIELDS if f in row or f in ('name', 'price')
+                    })
+                continue
+
+            diff = {}
+            for field in ('name', 'price', 'is_active', 'stock'):
+                if field in row and row[field] is not None and getattr(product, field) != row[field]:
+                    diff[field] = (getattr(product, field), row[field])
+            if 'category' in row and product.category_id != (category.pk if category else None):
+                diff['category'] = (product.category.name if product.category_id else None, row['category'])
+            if not diff:
+                result.unchanged += 1
+                continue
+            result.updated += 1
+            if dry_run:
+                result.add_change(line, 'update', key, diff)
+            if 'stock' in diff:
+                movements.append(StockMovement(
+                    product=product, kind=StockMovement.ADJUSTMENT, quantity=row['stock'] - product.stock,
+                    user=user, note='Import',
+                ))
+            valuation.add_product(change, product.category_id, product.stock, product.price, sign=-1)
+            for field, (_, new) in diff.items():
+                setattr(product, field, category if field == 'category' else new)
+            valuation.add_product(change, product.category_id, product.stock, product.price)
+            product.updated_at = now
+            to_update[product.pk] = product
+
+        if dry_run:
+            transaction.set_rollback(True)
+            return
+
+        created = Product.objects.bulk_create(to_create)
+        movements.extend(
+            StockMovement(product=p, kind=StockMovement.RESTOCK, quantity=p.stock, user=user, note='Import initial stock')
+            for p in created if p.stock
+        )
+        Product.objects.bulk_update(
+            to_update.values(), ['name', 'category', 'price', 'is_active', 'stock', 'updated_at'], batch_size=1000,
+        )
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+        for p in created:
+            valuation.add_product(change, p.category_id, p.stock, p.price)
+        valuation.apply(change)
+        # Bulk writes skip model signals
+        changed = list(to_update)
+        transaction.on_commit(lambda: (bump(CATALOG, PRODUCTS), lookup.invalidate(*changed)))
+
+
+def open_records(fh, fmt):
+    return iter_json(fh) if fmt == 'json' else iter_csv(fh)
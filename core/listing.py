@@ -0,0 +1,58 @@
+import hashlib
+
+from .pagination import CachedCountPaginator
+
+PER_PAGE = 50
+
+
+class Listing:
+    """
+    Search, sort and page a staff list from the request's ``q``, ``sort`` and
+    ``page`` parameters.
+
+    ``sorts`` maps a public sort key to the fields it orders by; anything else
+    falls back to ``default``. The primary key is appended as a tie-breaker so
+    offset pages are stable. ``filters`` are the extra parameters that narrow
+    the queryset; they are part of the cached count's key.
+    """
+
+    def __init__(self, request, qs, name, depends, sorts, default, search=None, filters=None, per_page=PER_PAGE):
+        self.params = request.GET
+        self.q = request.GET.get('q', '').strip()
+        self.filters = filters or {}
+        if self.q and search:
+            qs = search(qs, self.q)
+
+        sort = request.GET.get('sort', default)
+        if sort.lstrip('-') not in sorts:
+            sort = default
+        self.sort = sort
+        desc = sort.startswith('-')
+        fields = [f'-{f}' if desc else f for f in sorts[sort.lstrip('-')]]
+        qs = qs.order_by(*fields, '-pk' if desc else 'pk')
+
+        state = '|'.join([self.q, *(f'{k}={v}' for k, v in sorted(self.filters.items()))])
+        key = f'{name}:{hashlib.md5(state.encode()).hexdigest()}'
+        self.paginator = CachedCountPaginator(qs, per_page, key, depends)
+        self.page = self.paginator.get_page(request.GET.get('page'))
+
+    def __iter__(self):
+        return iter(self.page)
+
+    def query_string(self, **changes):
+        """The current parameters with ``changes`` applied (``None`` drops one), for links."""
+        params = self.params.copy()
+        for key, value in changes.items():
+            params.pop(key, None)
+            if value is not None:
+                params[key] = value
+        return params.urlencode()
+
+    @property
+    def kept_params(self):
+        """Parameters a new search keeps (sort and filters), as ``(name, value)`` pairs."""
+        return [(k, v) for k, v in self.params.items() if k not in ('q', 'page')]
+
+    @property
+    def clear_search(self):
+        return self.query_string(q=None, page=None)
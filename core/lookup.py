@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .cache import versions, PRODUCTS
+from .models import Product
+
+
+class LRUCache:
+    """Small thread-safe LRU with a per-entry TTL, local to this process."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_codes = LRUCache(settings.SCAN_CACHE_SIZE, settings.SCAN_CACHE_TTL)
+# product id -> code currently cached for it, so a save can evict by id even if the SKU changed
+_code_by_product = {}
+_index_lock = threading.Lock()
+
+
+def _as_dict(product):
+    return {
+        'id': product['id'],
+        'sku': product['sku'],
+        'name': product['name'],
+        'price': str(product['price']),
+        'stock': product['stock'],
+        'is_active': product['is_active'],
+    }
+
+
+def resolve(codes):
+    """
+    Map each scanned code to its product info (or None), hitting the database once for all misses.
+
+    Entries are tagged with the shared ``PRODUCTS`` version, so a price or
+    status edit in any process makes every process refetch; checkouts only
+    evict locally, which leaves at most this process's stock figure stale.
+    """
+    codes = [c.strip() for c in codes if c and c.strip()]
+    # Read the version before the rows, so a concurrent edit can only make an entry look older
+    version = versions(PRODUCTS)[0]
+    found, missing = {}, []
+    for code in codes:
+        hit = _codes.get(code)
+        if hit is None or hit[1] != version:
+            missing.append(code)
+        else:
+            found[code] = hit[0]
+    if missing:
+        rows = Product.objects.filter(sku__in=missing).values('id', 'sku', 'name', 'price', 'stock', 'is_active')
+        for row in rows:
+            info = _as_dict(row)
+            found[row['sku']] = info
+            _codes.set(row['sku'], (info, version))
+            with _index_lock:
+                _code_by_product[row['id']] = row['sku']
+    return {code: found.get(code) for code in codes}
+
+
+def invalidate(*product_ids):
+    with _index_lock:
+        codes = [_code_by_product.pop(pid, None) for pid in product_ids]
+    for code in codes:
+        if code:
+            _codes.pop(code)
+
+
+def clear():
+    _codes.clear()
+    with _index_lock:
+        _code_by_product.clear()
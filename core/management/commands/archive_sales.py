@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+
+
+def parse_month(value):
+    try:
+        return archive.parse_month(value)
+    except ValueError:
+        raise CommandError(f'Invalid month {value!r}, expected YYYY-MM')
+
+
+class Command(BaseCommand):
+    help = 'Move the sales and line items of closed months to gzipped CSV, keeping their rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, default=12, help='Full months before the current one to keep live')
+        parser.add_argument('--month', type=parse_month, action='append', help='Archive only this month (YYYY-MM); repeatable')
+        parser.add_argument('--directory', help='Where to write the archives (default: ARCHIVE_DIR)')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the months that would be archived')
+
+    def handle(self, *args, **opts):
+        if opts['keep_months'] < 0:
+            raise CommandError('--keep-months must not be negative')
+        eligible = archive.closed_months(opts['keep_months'])
+        months = eligible
+        if opts['month']:
+            outside = [m for m in opts['month'] if m not in eligible]
+            if outside:
+                raise CommandError(
+                    f"Not closed, already archived or without sales: {', '.join(f'{m:%Y-%m}' for m in outside)}"
+                )
+            months = sorted(opts['month'])
+
+        if not months:
+            self.stdout.write('Nothing to archive')
+            return
+        for month in months:
+            if opts['dry_run']:
+                self.stdout.write(f'would archive {month:%Y-%m}')
+                continue
+            try:
+                period = archive.archive_month(month, opts['directory'])
+            except archive.ArchiveError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f'{month:%Y-%m}: {period.sales} sales, {period.items} items -> {period.sales_file}, {period.items_file}')
+        if not opts['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Archived {len(months)} month(s)'))
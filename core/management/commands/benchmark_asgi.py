@@ -0,0 +1,127 @@
+import asyncio
+import importlib
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+
+from core import routing
+from core.seeding import seed
+
+URLS = ['/', '/reports/sales/']
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+    cuts = statistics.quantiles(ordered, n=100) if len(ordered) > 1 else ordered * 99
+    return {
+        'requests': len(ordered),
+        'p50_ms': round(statistics.median(ordered), 3),
+        'p99_ms': round(cuts[98], 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'throughput_rps': round(len(ordered) / elapsed, 1),
+    }
+
+
+def reload_urls():
+    import inventory.urls
+    importlib.reload(inventory.urls)
+    clear_url_caches()
+
+
+class Command(BaseCommand):
+    help = 'Compare p50/p99 latency of the sync (WSGI) and async (ASGI) dashboard and report views under concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sales', type=int, default=5000, help='Sales to seed into the throwaway test database')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per URL and mode')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--with-cache', action='store_true', help='Keep the configured cache (default measures uncached aggregates)')
+        parser.add_argument('--output', default='bench_asgi.json')
+
+    def handle(self, *args, **opts):
+        if opts['requests'] < 2 or opts['concurrency'] < 1:
+            raise CommandError('--requests must be at least 2 and --concurrency at least 1')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        routing.mirror_replica()
+        try:
+            from django.contrib.auth.models import User
+            seed(sales=opts['sales'], products=max(50, opts['sales'] // 10), sellers=5, prefix='asgi')
+            staff = User.objects.create_user('bench-staff', is_staff=True)
+            caches = override_settings() if opts['with_cache'] else override_settings(CACHES=NO_CACHE)
+            with caches:
+                results = {
+                    'wsgi': self.run_sync(staff, opts),
+                    'asgi': self.run_async(staff, opts),
+                }
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for url in URLS:
+            for mode in ('wsgi', 'asgi'):
+                r = results[mode][url]
+                self.stdout.write(
+                    f"{url:<16} {mode}  p50 {r['p50_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  {r['throughput_rps']:7.1f} req/s"
+                )
+        with open(opts['output'], 'w') as fh:
+            json.dump({'options': {k: opts[k] for k in ('sales', 'requests', 'concurrency', 'with_cache')},
+                       'vendor': connection.vendor, 'results': results}, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {opts['output']}"))
+
+    def run_sync(self, user, opts):
+        local = threading.local()
+
+        def fetch(url):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(user)
+            started = time.perf_counter()
+            response = local.client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+            return (time.perf_counter() - started) * 1000
+
+        results = {}
+        with override_settings(ASYNC_VIEWS=False):
+            reload_urls()
+            with ThreadPoolExecutor(opts['concurrency']) as pool:
+                for url in URLS:
+                    started = time.perf_counter()
+                    latencies = list(pool.map(fetch, [url] * opts['requests']))
+                    results[url] = summarize(latencies, time.perf_counter() - started)
+        return results
+
+    def run_async(self, user, opts):
+        async def fetch(client, url, gate):
+            async with gate:
+                started = time.perf_counter()
+                response = await client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+                return (time.perf_counter() - started) * 1000
+
+        async def run_url(url):
+            client = AsyncClient()
+            await client.aforce_login(user)
+            gate = asyncio.Semaphore(opts['concurrency'])
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*[fetch(client, url, gate) for _ in range(opts['requests'])])
+            return summarize(latencies, time.perf_counter() - started)
+
+        results = {}
+        with override_settings(ASYNC_VIEWS=True):
+            reload_urls()
+            for url in URLS:
+                results[url] = asyncio.run(run_url(url))
+        reload_urls()
+        return results
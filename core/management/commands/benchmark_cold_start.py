@@ -0,0 +1,55 @@
+import json
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import coldstart
+
+
+class Command(BaseCommand):
+    help = 'Measure time-to-first-response of fresh processes; exit non-zero over budget or on regression.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/login/', help='Path of the first request')
+        parser.add_argument('--runs', type=int, default=7)
+        parser.add_argument('--budget-ms', type=float, help='Fail if the median time-to-first-response exceeds this')
+        parser.add_argument('--output', default='cold_start.json')
+        parser.add_argument('--baseline', help='Earlier output to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown vs baseline')
+
+    def handle(self, *args, **opts):
+        if opts['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+        try:
+            # One discarded run so every measured start finds compiled bytecode, as a deployed build does
+            coldstart.first_request(opts['url'])
+            runs = [coldstart.first_request(opts['url']) for _ in range(opts['runs'])]
+        except RuntimeError as exc:
+            raise CommandError(f'Cold start failed: {exc}')
+
+        status = runs[0]['status']
+        if status[:1] not in ('2', '3'):
+            raise CommandError(f"{opts['url']} answered {status}")
+        summary = {
+            key: round(statistics.median(run[key] for run in runs), 1)
+            for key in ('ttfr_ms', 'setup_ms', 'request_ms')
+        }
+        summary['ttfr_ms_max'] = round(max(run['ttfr_ms'] for run in runs), 1)
+        self.stdout.write(
+            f"{opts['url']} ({status}): time-to-first-response {summary['ttfr_ms']} ms median, "
+            f"{summary['ttfr_ms_max']} ms max; django.setup {summary['setup_ms']} ms, first request {summary['request_ms']} ms"
+        )
+        with open(opts['output'], 'w') as fh:
+            json.dump({'url': opts['url'], 'runs': opts['runs'], 'summary': summary}, fh, indent=2)
+
+        failures = []
+        if opts['budget_ms'] is not None and summary['ttfr_ms'] > opts['budget_ms']:
+            failures.append(f"median {summary['ttfr_ms']} ms is over the {opts['budget_ms']} ms budget")
+        if opts['baseline']:
+            with open(opts['baseline']) as fh:
+                before = json.load(fh)['summary']['ttfr_ms']
+            if summary['ttfr_ms'] > before * (1 + opts['tolerance']):
+                failures.append(f"median {summary['ttfr_ms']} ms regressed from {before} ms")
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {opts['output']}"))
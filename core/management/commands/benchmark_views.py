@@ -0,0 +1,153 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import routing
+from core.seeding import seed
+
+# (name, url, as_staff)
+VIEWS = [
+    ('dashboard', '/', True),
+    ('pos', '/pos/', False),
+    ('sales_list', '/sales/', True),
+    ('sales_report', '/reports/sales/', True),
+    ('product_list', '/products/', True),
+    ('catalog_api', '/api/catalog/?q=seed', False),
+]
+
+
+def parse_sizes(value):
+    try:
+        sizes = sorted({int(v) for v in value.split(',') if v.strip()})
+    except ValueError:
+        raise CommandError(f'Invalid --sizes {value!r}, expected e.g. 1000,10000')
+    if not sizes or sizes[0] < 1:
+        raise CommandError('--sizes must be positive integers')
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every main view at several data sizes in a throwaway test database and '
+        'write query counts, wall time and peak memory to JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=parse_sizes, default=parse_sizes('1000,10000'), help='Comma-separated sale counts')
+        parser.add_argument('--products-per-sale', type=float, default=0.1, help='Products seeded per sale (min 50)')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', default='bench_output.json')
+        parser.add_argument('--baseline', help='Earlier output to compare against; exit non-zero on regression')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative wall-time slowdown vs baseline')
+
+    def handle(self, *args, **opts):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        routing.mirror_replica()
+        try:
+            results = self.run(opts)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'vendor': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'repeat': opts['repeat'],
+            },
+            'results': results,
+        }
+        with open(opts['output'], 'w') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} measurements to {opts['output']}"))
+
+        if opts['baseline']:
+            self.compare(opts['baseline'], results, opts['tolerance'])
+
+    def run(self, opts):
+        from django.contrib.auth.models import User
+
+        staff = User.objects.create_user('bench-staff', is_staff=True)
+        seller = User.objects.create_user('bench-seller')
+        clients = {True: Client(), False: Client()}
+        clients[True].force_login(staff)
+        clients[False].force_login(seller)
+
+        results, seeded = [], 0
+        for size in opts['sizes']:
+            extra = size - seeded
+            seed(
+                categories=10, products=max(50, int(extra * opts['products_per_sale'])), sellers=5,
+                sales=extra, seed=size, prefix=f'bench{size}',
+            )
+            seeded = size
+            self.stdout.write(f'{size} sales seeded')
+            for name, url, as_staff in VIEWS:
+                results.append(self.measure(clients[as_staff], name, url, size, opts['repeat']))
+        return results
+
+    def measure(self, client, name, url, size, repeat):
+        row = {'size': size, 'view': name, 'url': url}
+        for mode in ('cold', 'warm'):
+            walls, queries, peaks = [], [], []
+            for _ in range(repeat):
+                if mode == 'cold':
+                    cache.clear()
+                tracemalloc.start()
+                # Count on every alias, since report views may read from the replica
+                with ExitStack() as stack:
+                    captured = [stack.enter_context(CaptureQueriesContext(conn)) for conn in connections.all()]
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    walls.append((time.perf_counter() - started) * 1000)
+                peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+                tracemalloc.stop()
+                queries.append(sum(len(ctx.captured_queries) for ctx in captured))
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+            row[mode] = {
+                'queries': max(queries),
+                'wall_ms_median': round(statistics.median(walls), 3),
+                'wall_ms_min': round(min(walls), 3),
+                'peak_kb': round(max(peaks), 1),
+            }
+        self.stdout.write(
+            f"  {name:<14} cold {row['cold']['wall_ms_median']:8.2f} ms {row['cold']['queries']:3d} q | "
+            f"warm {row['warm']['wall_ms_median']:8.2f} ms {row['warm']['queries']:3d} q"
+        )
+        return row
+
+    def compare(self, path, results, tolerance):
+        with open(path) as fh:
+            baseline = {(r['size'], r['view']): r for r in json.load(fh)['results']}
+        regressions = []
+        for row in results:
+            old = baseline.get((row['size'], row['view']))
+            if not old:
+                continue
+            for mode in ('cold', 'warm'):
+                new, was = row[mode], old[mode]
+                if new['queries'] > was['queries']:
+                    regressions.append(f"{row['view']}@{row['size']} {mode}: {was['queries']} -> {new['queries']} queries")
+                if new['wall_ms_median'] > was['wall_ms_median'] * (1 + tolerance):
+                    regressions.append(
+                        f"{row['view']}@{row['size']} {mode}: {was['wall_ms_median']} -> {new['wall_ms_median']} ms"
+                    )
+        for line in regressions:
+            self.stdout.write(self.style.ERROR(line))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) against {path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path}'))
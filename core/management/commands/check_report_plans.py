@@ -0,0 +1,33 @@
+import itertools
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import reports
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN every report grouping under every filter combination and fail if any plan '
+        'scans the whole sale or line-item table instead of an index range (SQLite and Postgres).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just failing ones')
+
+    def handle(self, *args, **opts):
+        # Filter values only need to be well-typed; plans don't depend on the rows existing
+        failures = 0
+        combos = list(itertools.product(reports.GROUPINGS, [None, 1], [None, 1], [None, 1]))
+        for group, seller, category, product in combos:
+            query = reports.ReportQuery(seller=seller, category=category, product=product, group=group)
+            vendor, plan = reports.explain(query)
+            bad = reports.full_scans(vendor, plan)
+            if bad or opts['verbose_plans']:
+                label = ' '.join(f'{k}={v}' for k, v in query.params().items() if k not in ('start', 'end'))
+                self.stdout.write(f"{'FULL SCAN' if bad else 'ok'}: {label}")
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+            failures += bool(bad)
+        if failures:
+            raise CommandError(f'{failures} of {len(combos)} report queries scan a whole table')
+        self.stdout.write(self.style.SUCCESS(f'All {len(combos)} report queries use index range scans ({vendor})'))
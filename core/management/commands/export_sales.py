@@ -0,0 +1,33 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exports
+
+
+class Command(BaseCommand):
+    help = 'Write a sales, line-item or daily-total export straight to disk, optionally gzip-compressed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=exports.KINDS)
+        parser.add_argument('output', help='Destination file')
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--start', help='First day (YYYY-MM-DD, inclusive)')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD, inclusive)')
+        parser.add_argument('--seller', help='Seller user id')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+
+    def handle(self, *args, **opts):
+        try:
+            filters = exports.ExportFilters.parse(opts)
+        except ValueError as exc:
+            raise CommandError(f'Invalid filter: {exc}')
+        _, stream = exports.export_stream(opts['kind'], filters, opts['format'])
+
+        opener = gzip.open if opts['gzip'] else open
+        written = 0
+        with opener(opts['output'], 'wb') as target:
+            for chunk in stream:
+                target.write(chunk)
+                written += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {opts['output']}"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import stock
+
+
+class Command(BaseCommand):
+    help = 'Fold new stock movements into the per-product snapshots, or check the ledger against Product.stock.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only compare ledger balances with Product.stock; exit non-zero on mismatch')
+
+    def handle(self, *args, **opts):
+        if opts['check']:
+            drift = stock.check()
+            for pid, product_stock, ledger_stock in drift:
+                self.stdout.write(f'product {pid}: stock {product_stock}, ledger {ledger_stock}')
+            if drift:
+                raise CommandError(f'{len(drift)} product(s) disagree with the stock ledger')
+            self.stdout.write(self.style.SUCCESS('Stock ledger matches Product.stock'))
+            return
+
+        watermark = stock.fold()
+        self.stdout.write(self.style.SUCCESS(f'Stock snapshots folded up to movement {watermark}'))
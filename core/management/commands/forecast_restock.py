@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import forecast
+from core.management.commands.rebuild_rollups import parse_day
+
+
+class Command(BaseCommand):
+    help = 'Forecast demand for every active product from the daily rollups and store restock suggestions.'
+
+    def add_arguments(self, parser):
+        defaults = forecast.Params()
+        parser.add_argument('--as-of', type=parse_day, help='Last day of history to use (default: yesterday)')
+        parser.add_argument('--trend-days', type=int, default=defaults.trend_days, help='Days of history for the trend and variability')
+        parser.add_argument('--lead-time', type=int, default=defaults.lead_time, help='Days from ordering to delivery')
+        parser.add_argument('--target-days', type=int, default=defaults.target_days, help='Extra days of cover an order should buy')
+        parser.add_argument('--z', type=float, default=defaults.z, help='Safety-stock factor (1.65 is about a 95%% service level)')
+
+    def handle(self, *args, **opts):
+        if opts['trend_days'] < 2 or opts['lead_time'] < 1 or opts['target_days'] < 0:
+            raise CommandError('--trend-days must be at least 2, --lead-time at least 1 and --target-days not negative')
+        params = forecast.Params(opts['trend_days'], opts['lead_time'], opts['target_days'], opts['z'])
+        started = time.perf_counter()
+        count = forecast.rebuild(opts['as_of'], params)
+        self.stdout.write(self.style.SUCCESS(f'Forecast {count} products in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import imports
+
+
+class Command(BaseCommand):
+    help = 'Create or update products from a CSV or JSON (array or JSON Lines) file in batched upserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and show the changes without writing')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--show', type=int, default=50, help='Changes to list in dry-run mode')
+
+    def handle(self, *args, **opts):
+        fmt = opts['format'] or ('json' if opts['path'].lower().endswith(('.json', '.jsonl')) else 'csv')
+        started = time.monotonic()
+
+        def progress(result):
+            self.stdout.write(
+                f'{result.rows} rows: {result.created} new, {result.updated} updated, '
+                f'{result.unchanged} unchanged, {len(result.errors)} errors ({time.monotonic() - started:.1f}s)'
+            )
+
+        try:
+            with open(opts['path'], encoding='utf-8-sig', newline='') as fh:
+                result = imports.import_products(
+                    imports.open_records(fh, fmt), dry_run=opts['dry_run'],
+                    chunk_size=opts['chunk_size'], progress=progress, max_changes=opts['show'],
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for line, message in result.errors:
+            self.stderr.write(f'line {line}: {message}')
+        if opts['dry_run']:
+            for line, action, key, diff in result.changes:
+                fields = ', '.join(f'{f}: {old!r} -> {new!r}' for f, (old, new) in diff.items())
+                self.stdout.write(f'line {line}: {action} {key}: {fields}')
+            if result.changes_omitted:
+                self.stdout.write(f'... and {result.changes_omitted} more changes')
+            self.stdout.write(self.style.WARNING('Dry run, nothing was written'))
+        progress(result)
+        if result.errors:
+            raise CommandError(f'{len(result.errors)} row(s) rejected')
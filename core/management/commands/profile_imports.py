@@ -0,0 +1,35 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import coldstart
+
+
+class Command(BaseCommand):
+    help = 'Show which modules a cold start spends its import time on (python -X importtime in a fresh process).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/login/', help='Path of the first request')
+        parser.add_argument('--top', type=int, default=25, help='How many modules to list')
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative')
+
+    def handle(self, *args, **opts):
+        try:
+            rows = coldstart.import_times(opts['url'])
+        except RuntimeError as exc:
+            raise CommandError(f'Cold start failed: {exc}')
+
+        by_package = defaultdict(int)
+        for name, self_us, _ in rows:
+            by_package[name.split('.')[0]] += self_us
+        total = sum(by_package.values())
+        self.stdout.write(f'{len(rows)} modules imported in {total / 1000:.1f} ms\n')
+
+        self.stdout.write('By top-level package (self time):')
+        for package, us in sorted(by_package.items(), key=lambda item: -item[1])[:opts['top']]:
+            self.stdout.write(f'  {us / 1000:8.1f} ms  {package}')
+
+        column = 2 if opts['sort'] == 'cumulative' else 1
+        self.stdout.write(f"\nSlowest modules ({opts['sort']}):")
+        for row in sorted(rows, key=lambda row: -row[column])[:opts['top']]:
+            self.stdout.write(f'  {row[2] / 1000:8.1f} ms cumulative {row[1] / 1000:8.1f} ms self  {row[0]}')
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import rollups
+
+
+def parse_day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or backfill the daily and per-seller sales rollups from raw Sale rows, or check them for drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_day, help='First day to rebuild/check (inclusive)')
+        parser.add_argument('--end', type=parse_day, help='Last day to rebuild/check (inclusive)')
+        parser.add_argument('--check', action='store_true', help='Only report drift; exit non-zero if any is found')
+
+    def handle(self, *args, **opts):
+        start, end = opts['start'], opts['end']
+        if opts['check']:
+            daily, by_seller = rollups.check(start, end)
+            for label, drift in (('daily', daily), ('seller', by_seller)):
+                for key, want, have in drift:
+                    self.stdout.write(f'{label} {key}: expected {want[0]} / {want[1]}, stored {have[0]} / {have[1]}')
+            if daily or by_seller:
+                raise CommandError(f'Rollup drift: {len(daily)} daily and {len(by_seller)} seller rows differ')
+            self.stdout.write(self.style.SUCCESS('Rollups match raw sales'))
+            return
+
+        days, seller_days = rollups.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {days} daily and {seller_days} seller-day rollup rows'))
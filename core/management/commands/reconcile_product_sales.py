@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-product and per-product-per-day sold quantity counters from SaleItem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift; exit non-zero if any is found')
+
+    def handle(self, *args, **opts):
+        if opts['check']:
+            totals, daily = rollups.check_product_sales()
+            for label, drift in (('total', totals), ('daily', daily)):
+                for key, want, have in drift:
+                    self.stdout.write(f'{label} {key}: expected {want}, stored {have}')
+            if totals or daily:
+                raise CommandError(f'Counter drift: {len(totals)} product and {len(daily)} product-day rows differ')
+            self.stdout.write(self.style.SUCCESS('Product counters match SaleItem'))
+            return
+
+        products, product_days = rollups.rebuild_product_sales()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {products} product and {product_days} product-day counters'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import valuation
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-category stock valuation from Product, or check the stored summary against it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift; exit non-zero if any is found')
+
+    def handle(self, *args, **opts):
+        if opts['check']:
+            drift = valuation.check()
+            for category_id, want, have in drift:
+                label = 'uncategorised' if category_id is None else f'category {category_id}'
+                self.stdout.write(
+                    f'{label}: expected {want[0]} products, {want[1]} units, {want[2]}; '
+                    f'stored {have[0]} products, {have[1]} units, {have[2]}'
+                )
+            if drift:
+                raise CommandError(f'Stock valuation drift in {len(drift)} categor{"y" if len(drift) == 1 else "ies"}')
+            self.stdout.write(self.style.SUCCESS('Stock valuation matches Product'))
+            return
+
+        rows = valuation.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the stock valuation for {rows} categories'))
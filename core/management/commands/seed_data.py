@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Category
+from core.seeding import seed
+
+
+class Command(BaseCommand):
+    help = 'Seed a reproducible synthetic data set (categories, products, sellers, sales and line items).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--sellers', type=int, default=10)
+        parser.add_argument('--sales', type=int, default=10000)
+        parser.add_argument('--items-per-sale', type=int, default=3, help='Average line items per sale')
+        parser.add_argument('--days', type=int, default=365, help='Spread sales over this many past days')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help='Prefix for generated names, SKUs and usernames')
+
+    def handle(self, *args, **opts):
+        if opts['products'] < 1:
+            raise CommandError('--products must be at least 1')
+        if Category.objects.filter(name__startswith=f"{opts['prefix']} category").exists():
+            raise CommandError(f"Data with prefix {opts['prefix']!r} already exists; pick another --prefix")
+        counts = seed(
+            categories=opts['categories'], products=opts['products'], sellers=opts['sellers'],
+            sales=opts['sales'], items_per_sale=opts['items_per_sale'], days=opts['days'],
+            seed=opts['seed'], batch_size=opts['batch_size'], prefix=opts['prefix'],
+            log=lambda msg: self.stdout.write(msg),
+        )
+        self.stdout.write(self.style.SUCCESS('Seeded ' + ', '.join(f'{v} {k}' for k, v in counts.items())))
@@ -0,0 +1,148 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestStats:
+    """What one request spent; filled from whichever threads run its queries."""
+
+    SLOWEST = 3
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.slowest = []  # (seconds, sql), longest first
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, seconds):
+        with self._lock:
+            self.queries += 1
+            self.sql_time += seconds
+            if len(self.slowest) < self.SLOWEST or seconds > self.slowest[-1][0]:
+                self.slowest.append((seconds, sql))
+                self.slowest.sort(key=lambda item: -item[0])
+                del self.slowest[self.SLOWEST:]
+
+    def add_render(self, seconds):
+        with self._lock:
+            self.render_time += seconds
+
+
+current = ContextVar('request_stats', default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    # Every connection, including the per-thread ones used by async views, reports into the request's stats
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[idx] += 1
+            series[-1] += value
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels))
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                running += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {running}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{base}}} {running}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels))
+            lines.append(f'{self.name}{{{base}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+VIEW = ('view',)
+requests_total = Counter('inventory_requests_total', 'Requests handled, by view and status code.')
+request_seconds = Histogram('inventory_request_duration_seconds', 'Wall time per request.', DURATION_BUCKETS)
+sql_seconds = Histogram('inventory_sql_duration_seconds', 'Total SQL time per request.', DURATION_BUCKETS)
+sql_queries = Histogram('inventory_sql_queries', 'SQL queries per request.', COUNT_BUCKETS)
+render_seconds = Histogram('inventory_render_duration_seconds', 'Template render time per request.', DURATION_BUCKETS)
+response_bytes = Histogram('inventory_response_bytes', 'Response body size (non-streaming responses).', BYTES_BUCKETS)
+
+
+def record(view, status, total, stats, size):
+    requests_total.inc((view, status))
+    request_seconds.observe((view,), total)
+    sql_seconds.observe((view,), stats.sql_time)
+    sql_queries.observe((view,), stats.queries)
+    render_seconds.observe((view,), stats.render_time)
+    if size is not None:
+        response_bytes.observe((view,), size)
+
+
+def render_prometheus():
+    from .cache import stats as cache_stats
+
+    lines = requests_total.render(('view', 'status'))
+    for metric in (request_seconds, sql_seconds, sql_queries, render_seconds, response_bytes):
+        lines.extend(metric.render(VIEW))
+    counters = cache_stats()
+    lines.append('# HELP inventory_cache_requests_total Versioned cache lookups in this process.')
+    lines.append('# TYPE inventory_cache_requests_total counter')
+    lines.append(f'inventory_cache_requests_total{{result="hit"}} {counters["hits"]}')
+    lines.append(f'inventory_cache_requests_total{{result="miss"}} {counters["misses"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,79 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics, routing
+
+logger = logging.getLogger('core.slow')
+
+
+class InstrumentationMiddleware:
+    """
+    Times each request and attributes SQL and template render time to its view.
+
+    Adds a ``Server-Timing`` header, logs requests slower than
+    ``SLOW_REQUEST_MS`` with their slowest queries, and feeds the histograms
+    served at ``/metrics``. Per-query cost is one ``perf_counter`` pair.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = settings.SLOW_REQUEST_MS / 1000
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - started)
+
+    def _finish(self, request, response, stats, total):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        metrics.record(view, response.status_code, total, stats, size)
+
+        response['Server-Timing'] = (
+            f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries", '
+            f'render;dur={stats.render_time * 1000:.1f}, total;dur={total * 1000:.1f}'
+        )
+        if total >= self.slow_seconds:
+            slowest = ''.join(f'\n  {seconds * 1000:.1f}ms {sql[:500]}' for seconds, sql in stats.slowest)
+            logger.warning(
+                'Slow request %s %s (%s) %.0fms: %d queries in %.0fms, render %.0fms%s',
+                request.method, request.path, view, total * 1000,
+                stats.queries, stats.sql_time * 1000, stats.render_time * 1000, slowest,
+            )
+        return response
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    """After a write (checkout, edit, login), pin the browser to the primary for ``REPLICA_PIN_SECONDS``."""
+
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and routing.replica_configured():
+            response.set_cookie(routing.PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
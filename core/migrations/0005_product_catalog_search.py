@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:09
+
+from django.db import DatabaseError, migrations, models, transaction
+
+
+# istartswith/icontains compile to UPPER("name"::text) LIKE ... on Postgres, which
+# neither the plain btree index nor SQLite can serve; add matching indexes there only.
+PREFIX_INDEX = 'CREATE INDEX IF NOT EXISTS product_name_upper_prefix_idx ON core_product (UPPER(name::text) text_pattern_ops)'
+TRIGRAM_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS product_name_upper_trgm_idx ON core_product USING gin (UPPER(name::text) gin_trgm_ops)',
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(PREFIX_INDEX)
+    # pg_trgm needs extension privileges; substring search still works (unindexed) without it
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for sql in TRIGRAM_INDEX:
+                schema_editor.execute(sql)
+    except DatabaseError:
+        pass
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS product_name_upper_trgm_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS product_name_upper_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_product_sales_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'name'], name='product_active_name_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_sale_client_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestockSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('avg_7', models.FloatField(default=0)),
+                ('avg_28', models.FloatField(default=0)),
+                ('trend', models.FloatField(default=0)),
+                ('daily_demand', models.FloatField(default=0)),
+                ('days_of_cover', models.FloatField(blank=True, null=True)),
+                ('reorder_point', models.PositiveIntegerField(default=0)),
+                ('suggested_quantity', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='restock', to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['days_of_cover'], name='restock_cover_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_archived_periods'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_at', 'seller'], name='sale_created_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saleitem',
+            index=models.Index(fields=['product', 'sale'], name='saleitem_product_sale_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:52
+
+from django.db import migrations, models
+
+
+# The staff lists search with istartswith, i.e. UPPER(col::text) LIKE 'X%' on Postgres;
+# like 0005 for products, only an expression index with text_pattern_ops serves that.
+SEARCH_INDEXES = {
+    'category_name_upper_prefix_idx': ('core_category', 'name'),
+    'user_username_upper_prefix_idx': ('auth_user', 'username'),
+    'user_email_upper_prefix_idx': ('auth_user', 'email'),
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, (table, column) in SEARCH_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} (UPPER({column}::text) text_pattern_ops)')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name in SEARCH_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_report_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['stock'], name='product_active_stock_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
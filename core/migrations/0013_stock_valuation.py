@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:56
+
+import core.models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def initial_valuation(apps, schema_editor):
+    # Start the summary from the stock levels that predate it
+    Product = apps.get_model('core', 'Product')
+    CategoryValuation = apps.get_model('core', 'CategoryValuation')
+    rows = (
+        Product.objects.values('category_id').order_by()
+        .annotate(n=models.Count('id'), units=models.Sum('stock'), value=models.Sum(models.F('stock') * models.F('price')))
+    )
+    CategoryValuation.objects.bulk_create([
+        CategoryValuation(category_id=r['category_id'], products=r['n'], units=r['units'] or 0, value=r['value'] or 0)
+        for r in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_staff_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('products', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_active_stock_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=core.models.default_reorder_level),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('stock__lte', models.F('reorder_level'))), fields=['stock'], name='product_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='categoryvaluation',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='categoryvaluation',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('category', models.Value(0)), name='valuation_category_uniq'),
+        ),
+        migrations.RunPython(initial_valuation, migrations.RunPython.noop),
+    ]
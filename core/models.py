@@ -1,27 +1,78 @@
 
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 
 class Category(models.Model):
     name = models.CharField(max_length=120, unique=True)
+    # Part of the POS catalog API's ETag/Last-Modified, whose rows carry the category name
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+def default_reorder_level():
+    return settings.LOW_STOCK_THRESHOLD
+
+# Active products at or below their own reorder level; queries must use exactly this
+# predicate for the planner to pick the matching partial index
+LOW_STOCK = models.Q(is_active=True, stock__lte=models.F('reorder_level'))
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
+    # Scanner code (SKU/barcode); NULL rather than '' when unset so uniqueness holds
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
+    reorder_level = models.PositiveIntegerField(default=default_reorder_level)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # POS catalog: active products by name, prefix search; see 0005 for Postgres-only search indexes
+            models.Index(fields=['is_active', 'name'], name='product_active_name_idx'),
+            # Low-stock list and alerts: only the rows below their reorder level are in the index
+            models.Index(fields=['stock'], condition=LOW_STOCK, name='product_low_stock_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+class CategoryValuation(models.Model):
+    # Stock on hand valued at current prices, per category (NULL = uncategorised); kept in step by core.valuation
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    products = models.IntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # One row per category, including a single uncategorised row
+            models.UniqueConstraint(Coalesce('category', models.Value(0)), name='valuation_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.category or 'Uncategorised'}: {self.value}"
+
 class Sale(models.Model):
     seller = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Idempotency key generated by the till for offline-synced sales
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the sales history, for staff and per seller
+            models.Index(fields=['-created_at', '-id'], name='sale_created_id_idx'),
+            models.Index(fields=['seller', '-created_at', '-id'], name='sale_seller_created_id_idx'),
+            # Report engine: date range first, seller filtered from the index entries (core.reports)
+            models.Index(fields=['created_at', 'seller'], name='sale_created_seller_idx'),
+        ]
 
     def __str__(self):
         return f"Sale #{self.id} - {self.created_at:%Y-%m-%d %H:%M}"
@@ -32,5 +83,125 @@ class SaleItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Report engine: a product's line items, joined to their sales by id (core.reports)
+            models.Index(fields=['product', 'sale'], name='saleitem_product_sale_idx'),
+        ]
+
     def line_total(self):
         return self.quantity * self.price
+
+class DailySales(models.Model):
+    # Rollup of Sale per day, kept in step by core.rollups at checkout
+    day = models.DateField(unique=True)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.count} sales, {self.total}"
+
+class DailySellerSales(models.Model):
+    day = models.DateField()
+    seller = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'seller'], name='daily_seller_sales_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.seller}: {self.count} sales, {self.total}"
+
+class ProductSales(models.Model):
+    # All-time sold quantity per product, kept in step by core.rollups at checkout
+    product = models.OneToOneField(Product, related_name='sales_counter', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['-quantity'], name='product_sales_qty_idx')]
+
+    def __str__(self):
+        return f"{self.product}: {self.quantity} sold"
+
+class ProductDailySales(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(Product, related_name='daily_sales', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='product_daily_sales_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product}: {self.quantity} sold"
+
+class StockMovement(models.Model):
+    # Append-only ledger of every change to Product.stock; see core.stock
+    SALE = 'sale'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    KIND_CHOICES = [(SALE, 'Sale'), (RESTOCK, 'Restock'), (ADJUSTMENT, 'Adjustment')]
+
+    product = models.ForeignKey(Product, related_name='movements', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()  # signed: negative for stock leaving the shop
+    sale = models.ForeignKey(Sale, null=True, blank=True, on_delete=models.SET_NULL)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'id'], name='stock_movement_product_idx')]
+
+    def __str__(self):
+        return f"{self.product} {self.quantity:+d} ({self.kind})"
+
+class StockSnapshot(models.Model):
+    # On-hand figure folded from movements up to and including movement_id
+    product = models.OneToOneField(Product, related_name='stock_snapshot', on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product}: {self.quantity} @ movement {self.movement_id}"
+
+class RestockSuggestion(models.Model):
+    # Output of core.forecast, rebuilt by `manage.py forecast_restock`
+    product = models.OneToOneField(Product, related_name='restock', on_delete=models.CASCADE)
+    avg_7 = models.FloatField(default=0)
+    avg_28 = models.FloatField(default=0)
+    trend = models.FloatField(default=0)  # change in units/day per day
+    daily_demand = models.FloatField(default=0)
+    days_of_cover = models.FloatField(null=True, blank=True)  # null when there is no demand
+    reorder_point = models.PositiveIntegerField(default=0)
+    suggested_quantity = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['days_of_cover'], name='restock_cover_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product}: order {self.suggested_quantity}"
+
+class ArchivedPeriod(models.Model):
+    # A closed month whose Sale/SaleItem rows were moved to gzipped CSV by core.archive; rollups are kept
+    month = models.DateField(unique=True)  # first day of the month
+    sales = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sales_file = models.CharField(max_length=255)
+    items_file = models.CharField(max_length=255)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['month']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.sales} sales archived"
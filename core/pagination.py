@@ -0,0 +1,83 @@
+import base64
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .cache import get_or_build
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj):
+    raw = f'{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(qs, after=None, before=None, per_page=50):
+    """
+    Page ``qs`` newest first on ``(created_at, id)``.
+
+    ``after`` walks to older rows, ``before`` back to newer ones. Each page is
+    a single index range scan no matter how deep into the history it is.
+    """
+    if before:
+        created_at, pk = decode_cursor(before)
+        qs = qs.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+        rows = list(qs.order_by('created_at', 'pk')[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_newer, has_older = has_more, True
+    else:
+        if after:
+            created_at, pk = decode_cursor(after)
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        rows = list(qs.order_by('-created_at', '-pk')[:per_page + 1])
+        has_older = len(rows) > per_page
+        rows = rows[:per_page]
+        has_newer = bool(after)
+
+    next_cursor = encode_cursor(rows[-1]) if rows and has_older else None
+    prev_cursor = encode_cursor(rows[0]) if rows and has_newer else None
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Offset paginator whose total is cached under ``name`` until one of the
+    ``depends`` namespaces is bumped, so flipping pages doesn't rerun COUNT(*).
+    """
+
+    def __init__(self, object_list, per_page, name, depends, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_name = f'count:{name}'
+        self.depends = depends
+
+    @cached_property
+    def count(self):
+        return get_or_build(self.cache_name, self.depends, lambda: Paginator.count.func(self))
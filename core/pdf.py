@@ -0,0 +1,152 @@
+import zlib
+from decimal import Decimal
+
+A4 = (595, 842)
+MARGIN = 40
+
+# Advance widths (1/1000 em) of Helvetica glyphs that matter for right-aligned numbers; others use AVERAGE
+_WIDTHS = {**{d: 556 for d in '0123456789'}, '.': 278, ',': 278, '-': 333, ' ': 278, ':': 278, '+': 584}
+_AVERAGE = 520
+
+
+def text_width(text, size):
+    return sum(_WIDTHS.get(ch, _AVERAGE) for ch in text) * size / 1000
+
+
+def _escape(text):
+    data = str(text).encode('cp1252', 'replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class PdfWriter:
+    """
+    Text-only PDF written straight to a binary file object.
+
+    Each page is flushed as soon as it is added; only the byte offset of each
+    object and the page ids are kept, so memory stays flat however many pages
+    a document has. Uses the standard Helvetica fonts, so nothing is embedded.
+    """
+
+    CATALOG, PAGES, FONT, BOLD = 1, 2, 3, 4
+
+    def __init__(self, fh, page_size=A4):
+        self.fh = fh
+        self.page_size = page_size
+        self.offsets = {}
+        self.pages = []
+        self.next_id = 5
+        self.position = 0
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        for obj_id, font in ((self.FONT, b'Helvetica'), (self.BOLD, b'Helvetica-Bold')):
+            self._object(obj_id, b'<< /Type /Font /Subtype /Type1 /BaseFont /' + font + b' /Encoding /WinAnsiEncoding >>')
+
+    def _write(self, data):
+        self.fh.write(data)
+        self.position += len(data)
+
+    def _object(self, obj_id, body):
+        self.offsets[obj_id] = self.position
+        self._write(b'%d 0 obj\n' % obj_id + body + b'\nendobj\n')
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def add_page(self, items):
+        """``items`` are ``(x, y, text, size, bold)`` with y measured from the top of the page."""
+        height = self.page_size[1]
+        ops = []
+        for x, y, text, size, bold in items:
+            font = b'/F2' if bold else b'/F1'
+            ops.append(b'BT %s %g Tf %g %g Td (%s) Tj ET' % (font, size, x, height - y, _escape(text)))
+        stream = zlib.compress(b'\n'.join(ops))
+        content_id, page_id = self._new_id(), self._new_id()
+        self._object(
+            content_id,
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(stream) + stream + b'\nendstream',
+        )
+        self._object(page_id, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %g %g] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> >>'
+        ) % (self.PAGES, self.page_size[0], height, content_id, self.FONT, self.BOLD))
+        self.pages.append(page_id)
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % page for page in self.pages)
+        self._object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))
+        self._object(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        xref_at = self.position
+        count = self.next_id
+        lines = [b'xref\n0 %d\n' % count, b'0000000000 65535 f \n']
+        lines += [b'%010d 00000 n \n' % self.offsets[i] for i in range(1, count)]
+        self._write(b''.join(lines))
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (count, self.CATALOG, xref_at))
+
+
+def _fit(text, width, size):
+    text = str(text)
+    while text and text_width(text, size) > width:
+        text = text[:-2] + '…' if len(text) > 1 else ''
+    return text
+
+
+def _cell(value):
+    if isinstance(value, Decimal):
+        return f'{value:.2f}'
+    return '' if value is None else str(value)
+
+
+def write_tables(writer, title, header_lines, sections, size=9):
+    """
+    Lay out ``sections`` (``(heading, columns, rows)``) as paginated tables.
+
+    ``columns`` are ``(label, width_in_points, align)`` with align ``'l'`` or
+    ``'r'``. ``rows`` may be a lazy iterator; it is consumed one page at a time.
+    Column headers repeat on every page and each page is numbered.
+    """
+    width, height = writer.page_size
+    line = size * 1.5
+    page, y, number = [], 0, 0
+
+    def start_page(first):
+        nonlocal page, y, number
+        number += 1
+        page = [(MARGIN, MARGIN, title, 14, True)]
+        y = MARGIN + 22
+        if first:
+            for text in header_lines:
+                page.append((MARGIN, y, text, size + 1, False))
+                y += line
+            y += line / 2
+
+    def flush():
+        page.append((width - MARGIN - text_width(f'Page {number}', size), height - MARGIN / 2, f'Page {number}', size, False))
+        writer.add_page(page)
+
+    def column_row(columns, values, bold):
+        x = MARGIN
+        for (_, col_width, align), value in zip(columns, values):
+            text = _fit(_cell(value), col_width - 4, size)
+            left = x + col_width - 4 - text_width(text, size) if align == 'r' else x
+            page.append((left, y, text, size, bold))
+            x += col_width
+
+    start_page(True)
+    for heading, columns, rows in sections:
+        if y + line * 3 > height - MARGIN:
+            flush()
+            start_page(False)
+        page.append((MARGIN, y + 4, heading, size + 2, True))
+        y += line * 1.5
+        column_row(columns, [c[0] for c in columns], True)
+        y += line
+        for values in rows:
+            if y + line > height - MARGIN:
+                flush()
+                start_page(False)
+                column_row(columns, [c[0] for c in columns], True)
+                y += line
+            column_row(columns, values, False)
+            y += line
+        y += line
+    flush()
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from .cache import versions, SALES
+from .models import DailySales, DailySellerSales
+from . import exports, pdf
+
+_executor = None
+_jobs = {}  # cache path -> Future, for reports being generated in this process
+_lock = threading.RLock()  # re-entered when a job finishes before its callback is attached
+
+
+def _path(kind, key_data):
+    # Content-addressed: the same inputs (and data version) always map to the same file
+    digest = hashlib.sha256(json.dumps(key_data, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+    return os.path.join(settings.PDF_CACHE_DIR, kind, f'{digest}.pdf')
+
+
+def _write_atomic(path, render):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp, 'wb') as fh:
+            writer = pdf.PdfWriter(fh)
+            render(writer)
+            writer.close()
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+# ----- Receipts -----
+def _receipt_data(sale):
+    items = [
+        (it.product.name, it.quantity, it.price, it.quantity * it.price)
+        for it in sale.items.select_related('product').order_by('pk')
+    ]
+    return {
+        'id': sale.pk,
+        'seller': str(sale.seller) if sale.seller else '',
+        'created_at': timezone.localtime(sale.created_at).strftime('%Y-%m-%d %H:%M'),
+        'total': sale.total,
+        'items': items,
+    }
+
+
+def receipt(sale):
+    """Path of the receipt PDF for ``sale``, rendered on first request and keyed by its exact contents."""
+    data = _receipt_data(sale)
+    path = _path('receipts', data)
+    if os.path.exists(path):
+        return path
+
+    def render(writer):
+        columns = [('Product', 275, 'l'), ('Qty', 50, 'r'), ('Price', 90, 'r'), ('Amount', 100, 'r')]
+        pdf.write_tables(
+            writer, f"Receipt #{data['id']}", [f"Date: {data['created_at']}", f"Seller: {data['seller']}"],
+            [('Items', columns, data['items']), ('', [('Total', 415, 'l'), (f"{data['total']:.2f}", 100, 'r')], [])],
+        )
+
+    return _write_atomic(path, render)
+
+
+# ----- Reports -----
+def report_path(filters):
+    # <hash of the filters>-<sales data version>.pdf: a new version supersedes the files of older ones
+    filters_path = _path('reports', {'start': filters.start, 'end': filters.end, 'seller': filters.seller})
+    return f'{filters_path[:-len(".pdf")]}-{versions(SALES)[0]}.pdf'
+
+
+def _evict_superseded(path):
+    # Every sale moves the version, so without this each report request after a sale would leave a file behind
+    directory, name = os.path.split(path)
+    prefix = name.rsplit('-', 1)[0] + '-'
+    for entry in os.scandir(directory):
+        if entry.name.startswith(prefix) and entry.name.endswith('.pdf') and entry.name != name:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # another worker evicted it first
+
+
+def _rollup(model, filters):
+    qs = model.objects.all()
+    if filters.start:
+        qs = qs.filter(day__gte=filters.start)
+    if filters.end:
+        qs = qs.filter(day__lte=filters.end)
+    return qs
+
+
+def report_size(filters):
+    """Number of sales a report covers, from the rollups (one small query)."""
+    qs = _rollup(DailySellerSales, filters).filter(seller_id=filters.seller) if filters.seller else _rollup(DailySales, filters)
+    return qs.aggregate(n=Sum('count'))['n'] or 0
+
+
+def _seller_rows(filters):
+    qs = _rollup(DailySellerSales, filters)
+    if filters.seller:
+        qs = qs.filter(seller_id=filters.seller)
+    rows = qs.values('seller__username').order_by('seller__username').annotate(c=Sum('count'), t=Sum('total'))
+    for row in rows:
+        yield (row['seller__username'], row['c'], row['t'])
+
+
+def _render_report(filters, path):
+    summary = exports.daily_rows(filters)
+    next(summary)  # header row
+    header = [
+        f"Period: {filters.start or 'beginning'} to {filters.end or timezone.localdate()}",
+        f'Generated: {timezone.localtime():%Y-%m-%d %H:%M}',
+    ]
+    if filters.seller:
+        header.append(f'Seller id: {filters.seller}')
+    items = exports.item_rows(filters)
+    next(items)
+    detail = (
+        (sale_id, created_at[:16].replace('T', ' '), seller, name, qty, price, line_total)
+        for sale_id, created_at, seller, _, _, name, qty, price, line_total in items
+    )
+
+    def render(writer):
+        pdf.write_tables(writer, 'Sales report', header, [
+            ('Daily totals', [('Day', 120, 'l'), ('Sales', 80, 'r'), ('Total', 100, 'r')], summary),
+            ('By seller', [('Seller', 120, 'l'), ('Sales', 80, 'r'), ('Total', 100, 'r')], _seller_rows(filters)),
+            ('Line items', [
+                ('Sale', 45, 'l'), ('Time', 80, 'l'), ('Seller', 70, 'l'), ('Product', 160, 'l'),
+                ('Qty', 35, 'r'), ('Price', 60, 'r'), ('Amount', 65, 'r'),
+            ], detail),
+        ])
+
+    _write_atomic(path, render)
+    _evict_superseded(path)
+    return path
+
+
+def _in_worker(filters, path):
+    try:
+        return _render_report(filters, path)
+    finally:
+        # Pool threads outlive the job; don't leave their connections open
+        connections.close_all()
+
+
+def report(filters, background=True):
+    """
+    Return ``(path, ready)`` for a report. A cached file is returned as is.
+    Otherwise the report is rendered inline (``background=False``) or queued
+    on the process's worker pool, and ``ready`` is False until it lands.
+    A failed background job re-raises its error once, then may be retried.
+    """
+    global _executor
+    path = report_path(filters)
+    if os.path.exists(path):
+        return path, True
+    if not background:
+        return _render_report(filters, path), True
+    with _lock:
+        job = _jobs.get(path)
+        if job is not None and job.done():
+            del _jobs[path]
+            if job.exception() is not None:
+                raise job.exception()
+            if os.path.exists(path):
+                return path, True
+        if path not in _jobs:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.PDF_WORKERS, thread_name_prefix='pdf')
+            job = _jobs[path] = _executor.submit(_in_worker, filters, path)
+            job.add_done_callback(lambda done: _forget(path, done))
+    return path, False
+
+
+def _forget(path, job):
+    # Finished reports are found on disk; failed jobs stay so the next request surfaces the error
+    if job.exception() is None:
+        with _lock:
+            _jobs.pop(path, None)
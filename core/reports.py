@@ -0,0 +1,214 @@
+import json
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.db import connections, router, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import ExtractHour, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .archive import month_end
+from .exports import ExportFilters
+from .models import ArchivedPeriod, Sale, SaleItem
+
+DEFAULT_DAYS = 30
+ROW_LIMIT = 500
+
+# grouping -> (label, expression over the sale's created_at given its path)
+TIME_GROUPS = {
+    'hour': ('Hour of day', lambda field: ExtractHour(field)),
+    'day': ('Day', lambda field: TruncDate(field)),
+    'week': ('Week', lambda field: TruncWeek(field, output_field=DateField())),
+    'month': ('Month', lambda field: TruncMonth(field, output_field=DateField())),
+}
+# grouping -> (label, key field, name field) on SaleItem
+ITEM_GROUPS = {
+    'category': ('Category', 'product__category_id', 'product__category__name'),
+    'product': ('Product', 'product_id', 'product__name'),
+}
+GROUPINGS = {name: spec[0] for name, spec in {**TIME_GROUPS, **ITEM_GROUPS}.items()}
+
+
+class ReportQuery(ExportFilters):
+    """
+    Export filters plus category/product filters and a grouping.
+
+    The date range is always bounded (the last ``DEFAULT_DAYS`` days unless
+    given), so every report is a range scan on the sale time indexes.
+    """
+
+    def __init__(self, start=None, end=None, seller=None, category=None, product=None, group='day'):
+        end = end or timezone.localdate()
+        super().__init__(start or end - timedelta(days=DEFAULT_DAYS - 1), end, seller)
+        self.category = category
+        self.product = product
+        self.group = group
+
+    @classmethod
+    def parse(cls, params):
+        """Build a query from a dict-like of strings; raises ValueError on bad input."""
+        base = ExportFilters.parse(params)
+        category = int(params['category']) if params.get('category') else None
+        product = int(params['product']) if params.get('product') else None
+        group = params.get('group') or 'day'
+        if group not in GROUPINGS:
+            raise ValueError(f'Unknown grouping {group!r}')
+        query = cls(base.start, base.end, base.seller, category, product, group)
+        if query.start > query.end:
+            raise ValueError('start is after end')
+        return query
+
+    def params(self, **changes):
+        values = {
+            'start': self.start, 'end': self.end, 'seller': self.seller,
+            'category': self.category, 'product': self.product, 'group': self.group,
+        }
+        values.update(changes)
+        return {k: v.isoformat() if isinstance(v, date) else v for k, v in values.items() if v is not None}
+
+    def cache_name(self):
+        return 'sales-report:' + json.dumps(self.params(), sort_keys=True, separators=(',', ':'))
+
+    @property
+    def by_item(self):
+        # Sale rows alone answer time groupings; anything about products needs the line items
+        return bool(self.category or self.product or self.group in ITEM_GROUPS)
+
+
+def _filtered(query):
+    # The filtered rows a report aggregates, their measures and the path to the sale time
+    if query.by_item:
+        qs = SaleItem.objects.filter(**query.created_range('sale__created_at'))
+        if query.seller:
+            qs = qs.filter(sale__seller_id=query.seller)
+        if query.category:
+            qs = qs.filter(product__category_id=query.category)
+        if query.product:
+            qs = qs.filter(product_id=query.product)
+        measures = {
+            'n_sales': Count('sale_id', distinct=True),
+            'units': Sum('quantity'),
+            'amount': Sum(F('quantity') * F('price')),
+        }
+        created = 'sale__created_at'
+    else:
+        qs = Sale.objects.filter(**query.created_range())
+        if query.seller:
+            qs = qs.filter(seller_id=query.seller)
+        measures = {'n_sales': Count('id'), 'amount': Sum('total')}
+        created = 'created_at'
+    return qs, measures, created
+
+
+def queryset(query):
+    """
+    The single aggregate query behind a report, as ``values()`` rows of ``key, name, n_sales, units, amount``.
+
+    Category and product groupings return up to ``ROW_LIMIT + 1`` rows so ``run`` can tell they were cut.
+    """
+    qs, measures, created = _filtered(query)
+    if query.group in ITEM_GROUPS:
+        _, key, name = ITEM_GROUPS[query.group]
+        return qs.values(key=F(key), name=F(name)).annotate(**measures).order_by('-amount', 'key')[:ROW_LIMIT + 1]
+    expression = TIME_GROUPS[query.group][1](created)
+    return qs.annotate(key=expression).values('key').annotate(**measures).order_by('key')
+
+
+def _label(group, key, name):
+    if group == 'hour':
+        return f'{key:02d}:00'
+    if group == 'week':
+        return f'Week of {key:%Y-%m-%d}'
+    if group == 'month':
+        return f'{key:%Y-%m}'
+    if group in ITEM_GROUPS:
+        return name or ('Uncategorised' if group == 'category' else f'#{key}')
+    return key.isoformat()
+
+
+def _drill(query, key):
+    params = _drill_params(query, key)
+    return urlencode(params) if params else None
+
+
+def _drill_params(query, key):
+    # The next level down for a row
+    if query.group == 'month':
+        return query.params(start=max(key, query.start), end=min(month_end(key), query.end), group='day')
+    if query.group == 'week':
+        return query.params(start=max(key, query.start), end=min(key + timedelta(days=6), query.end), group='day')
+    if query.group == 'day':
+        return query.params(start=key, end=key, group='hour')
+    if query.group == 'category' and key is not None:
+        return query.params(category=key, group='product')
+    if query.group == 'product':
+        return query.params(product=key, group='day')
+    return None
+
+
+def _measures(row):
+    return {
+        'sales': row['n_sales'],
+        'quantity': row.get('units'),
+        'total': (row['amount'] or Decimal(0)).quantize(Decimal('0.01')),
+    }
+
+
+def totals(query):
+    """Grand totals over every row the filters match, however many groups ``run`` shows; one aggregate query."""
+    qs, measures, _ = _filtered(query)
+    return _measures(qs.aggregate(**measures))
+
+
+def run(query):
+    """
+    The report as a dict: ``rows`` (dicts with ``label``, ``sales``, ``quantity``,
+    ``total`` and ``drill``, a query string or None), ``truncated`` when a
+    category or product grouping had more than ``ROW_LIMIT`` rows, and ``totals``.
+    """
+    rows = [
+        {'label': _label(query.group, row['key'], row.get('name')), **_measures(row), 'drill': _drill(query, row['key'])}
+        for row in queryset(query)
+    ]
+    return {'rows': rows[:ROW_LIMIT], 'truncated': len(rows) > ROW_LIMIT, 'totals': totals(query)}
+
+
+def archived_months(query):
+    """Archived months overlapping the range; their raw rows are gone, so reports don't include them."""
+    return list(
+        ArchivedPeriod.objects.filter(month__gte=query.start.replace(day=1), month__lte=query.end)
+        .order_by('month').values_list('month', flat=True)
+    )
+
+
+# ----- Plan checks -----
+SCANNED_TABLES = (Sale._meta.db_table, SaleItem._meta.db_table)
+
+
+def explain(query):
+    """The database's plan for ``query`` as text lines (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on Postgres)."""
+    qs = queryset(query)
+    connection = connections[router.db_for_read(qs.model)]
+    sql, params = qs.query.sql_with_params()
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Tiny or unanalysed tables make a seq scan the cheapest plan; ask whether an index path exists
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}', params)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        else:
+            cursor.execute(f'EXPLAIN {sql}', params)
+        rows = cursor.fetchall()
+    return connection.vendor, [' '.join(str(col) for col in row) for row in rows]
+
+
+def full_scans(vendor, plan):
+    """Lines of ``plan`` that read the whole sale or line-item table instead of an index range."""
+    patterns = [
+        re.compile(rf'\bSCAN {table}\b' if vendor == 'sqlite' else rf'Seq Scan on {table}\b')
+        for table in SCANNED_TABLES
+    ]
+    return [line for line in plan if any(p.search(line) for p in patterns)]
@@ -0,0 +1,203 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Sale, SaleItem, DailySales, DailySellerSales, ProductSales, ProductDailySales
+from .archive import archived_q
+
+
+def sale_day(sale):
+    return timezone.localdate(sale.created_at)
+
+
+def record_sale(sale):
+    """Add a freshly committed sale to the rollups; call inside the checkout transaction."""
+    day = sale_day(sale)
+    # Make sure the rows exist, then bump them in place so concurrent tills never lose an increment
+    DailySales.objects.bulk_create([DailySales(day=day)], ignore_conflicts=True)
+    DailySales.objects.filter(day=day).update(count=F('count') + 1, total=F('total') + sale.total)
+    DailySellerSales.objects.bulk_create([DailySellerSales(day=day, seller_id=sale.seller_id)], ignore_conflicts=True)
+    DailySellerSales.objects.filter(day=day, seller_id=sale.seller_id).update(
+        count=F('count') + 1, total=F('total') + sale.total,
+    )
+
+
+def record_items(sale, basket):
+    """Add ``basket`` (``{product_id: quantity}``) to the per-product counters in a fixed number of queries."""
+    day = sale_day(sale)
+    bump = Case(
+        *[When(product_id=pid, then=F('quantity') + Value(qty)) for pid, qty in basket.items()],
+        output_field=IntegerField(),
+    )
+    ProductSales.objects.bulk_create([ProductSales(product_id=pid) for pid in basket], ignore_conflicts=True)
+    ProductSales.objects.filter(product_id__in=basket.keys()).update(quantity=bump)
+    ProductDailySales.objects.bulk_create(
+        [ProductDailySales(day=day, product_id=pid) for pid in basket], ignore_conflicts=True,
+    )
+    ProductDailySales.objects.filter(day=day, product_id__in=basket.keys()).update(quantity=bump)
+
+
+def top_products(days=None, limit=5):
+    """
+    Best sellers as ``[{'product_id', 'product__name', 'quantity'}]``.
+
+    ``days=None`` reads the all-time counters; ``days=1`` is today, ``days=7``
+    today and the six days before it, and so on.
+    """
+    if days is None:
+        qs = ProductSales.objects.filter(quantity__gt=0).values('product_id', 'product__name', 'quantity')
+        return list(qs.order_by('-quantity', 'product_id')[:limit])
+    since = timezone.localdate() - timedelta(days=days - 1)
+    qs = (
+        ProductDailySales.objects
+        .filter(day__gte=since)
+        .values('product_id', 'product__name')
+        .annotate(quantity=Sum('quantity'))
+        .order_by('-quantity', 'product_id')
+    )
+    return list(qs[:limit])
+
+
+def _sales_between(start=None, end=None):
+    # Archived months have no raw rows left; their rollups are the only record and are never recomputed
+    qs = Sale.objects.annotate(day=TruncDate('created_at')).exclude(archived_q())
+    if start:
+        qs = qs.filter(day__gte=start)
+    if end:
+        qs = qs.filter(day__lte=end)
+    return qs
+
+
+def compute_daily(start=None, end=None):
+    rows = _sales_between(start, end).values('day').order_by().annotate(count=Count('id'), total=Sum('total'))
+    return {r['day']: (r['count'], r['total']) for r in rows}
+
+
+def compute_daily_seller(start=None, end=None):
+    rows = (
+        _sales_between(start, end)
+        .values('day', 'seller_id').order_by()
+        .annotate(count=Count('id'), total=Sum('total'))
+    )
+    return {(r['day'], r['seller_id']): (r['count'], r['total']) for r in rows}
+
+
+def _range(qs, start, end):
+    qs = qs.exclude(archived_q())
+    if start:
+        qs = qs.filter(day__gte=start)
+    if end:
+        qs = qs.filter(day__lte=end)
+    return qs
+
+
+def stored_daily(start=None, end=None):
+    rows = _range(DailySales.objects, start, end).values('day').order_by().annotate(c=Sum('count'), t=Sum('total'))
+    return {r['day']: (r['c'], r['t']) for r in rows}
+
+
+def stored_daily_seller(start=None, end=None):
+    rows = (
+        _range(DailySellerSales.objects, start, end)
+        .values('day', 'seller_id').order_by()
+        .annotate(c=Sum('count'), t=Sum('total'))
+    )
+    return {(r['day'], r['seller_id']): (r['c'], r['t']) for r in rows}
+
+
+def rebuild(start=None, end=None, batch_size=1000):
+    """Recompute the rollups for a day range (everything when unbounded) from raw Sale rows; archived months are kept."""
+    daily = compute_daily(start, end)
+    by_seller = compute_daily_seller(start, end)
+    with transaction.atomic():
+        _range(DailySales.objects, start, end).delete()
+        _range(DailySellerSales.objects, start, end).delete()
+        DailySales.objects.bulk_create(
+            [DailySales(day=day, count=c, total=t) for day, (c, t) in daily.items()], batch_size=batch_size,
+        )
+        DailySellerSales.objects.bulk_create(
+            [DailySellerSales(day=day, seller_id=sid, count=c, total=t) for (day, sid), (c, t) in by_seller.items()],
+            batch_size=batch_size,
+        )
+    return len(daily), len(by_seller)
+
+
+def _diff(expected, stored):
+    drift = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        want = expected.get(key, (0, 0))
+        have = stored.get(key, (0, 0))
+        if want[0] != have[0] or (want[1] or 0) != (have[1] or 0):
+            drift.append((key, want, have))
+    return drift
+
+
+def check(start=None, end=None):
+    """Return ``(daily_drift, seller_drift)`` lists of ``(key, expected, stored)``."""
+    return (
+        _diff(compute_daily(start, end), stored_daily(start, end)),
+        _diff(compute_daily_seller(start, end), stored_daily_seller(start, end)),
+    )
+
+
+def compute_product_sales():
+    # All-time counters: live line items plus the kept daily rollups of archived months
+    totals = {}
+    rows = list(SaleItem.objects.values('product_id').order_by().annotate(quantity=Sum('quantity')))
+    archived = archived_q()
+    if archived:
+        rows += ProductDailySales.objects.filter(archived).values('product_id').order_by().annotate(quantity=Sum('quantity'))
+    for r in rows:
+        totals[r['product_id']] = totals.get(r['product_id'], 0) + r['quantity']
+    return totals
+
+
+def compute_product_daily_sales():
+    rows = (
+        SaleItem.objects
+        .annotate(day=TruncDate('sale__created_at'))
+        .exclude(archived_q())
+        .values('day', 'product_id').order_by()
+        .annotate(quantity=Sum('quantity'))
+    )
+    return {(r['day'], r['product_id']): r['quantity'] for r in rows}
+
+
+def rebuild_product_sales(batch_size=1000):
+    """Recompute every per-product counter from SaleItem."""
+    totals = compute_product_sales()
+    daily = compute_product_daily_sales()
+    with transaction.atomic():
+        ProductSales.objects.all().delete()
+        ProductDailySales.objects.exclude(archived_q()).delete()
+        ProductSales.objects.bulk_create(
+            [ProductSales(product_id=pid, quantity=qty) for pid, qty in totals.items()], batch_size=batch_size,
+        )
+        ProductDailySales.objects.bulk_create(
+            [ProductDailySales(day=day, product_id=pid, quantity=qty) for (day, pid), qty in daily.items()],
+            batch_size=batch_size,
+        )
+    return len(totals), len(daily)
+
+
+def check_product_sales():
+    """Return ``(total_drift, daily_drift)`` lists of ``(key, expected, stored)``."""
+    stored = dict(ProductSales.objects.filter(quantity__gt=0).values_list('product_id', 'quantity'))
+    stored_daily = {
+        (day, pid): qty
+        for day, pid, qty in (
+            ProductDailySales.objects.filter(quantity__gt=0).exclude(archived_q()).values_list('day', 'product_id', 'quantity')
+        )
+    }
+
+    def diff(expected, have):
+        return [
+            (key, expected.get(key, 0), have.get(key, 0))
+            for key in sorted(set(expected) | set(have), key=str)
+            if expected.get(key, 0) != have.get(key, 0)
+        ]
+
+    return diff(compute_product_sales(), stored), diff(compute_product_daily_sales(), stored_daily)
@@ -0,0 +1,69 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+PIN_COOKIE = 'primary_pin'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def read_alias():
+    """Database the current request's reports should read from."""
+    return REPLICA if _replica_reads.get() and replica_configured() else DEFAULT_DB_ALIAS
+
+
+def _pinned(request):
+    # Set for a few seconds after this browser wrote something, so it reads its own writes
+    return PIN_COOKIE in request.COOKIES
+
+
+def replica_reads(view):
+    """Route the ORM reads made while ``view`` runs to the replica, unless the client is pinned."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(not _pinned(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(not _pinned(request))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return wrapper
+
+
+def mirror_replica():
+    # What the test runner does for TEST['MIRROR']: after create_test_db, read the replica from the test database
+    if replica_configured():
+        connections[REPLICA].creation.set_as_test_mirror(connections[DEFAULT_DB_ALIAS].settings_dict)
+
+
+class ReplicaRouter:
+    """
+    Writes always go to ``default``. Reads go to the replica only inside a
+    view wrapped with ``replica_reads``, so everything else (checkout, admin,
+    imports) keeps reading from the primary it writes to.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
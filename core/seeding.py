@@ -0,0 +1,114 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Category, Product, Sale, SaleItem, StockMovement
+from . import rollups, valuation
+
+
+@contextmanager
+def _historical_timestamps():
+    # Let bulk_create keep the generated created_at instead of stamping "now"
+    field = Sale._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _chunks(n, size):
+    for start in range(0, n, size):
+        yield start, min(size, n - start)
+
+
+def seed(categories=20, products=1000, sellers=10, sales=10000, items_per_sale=3, days=365,
+         seed=42, batch_size=5000, prefix='seed', log=None):
+    """
+    Insert a reproducible synthetic data set with batched ``bulk_create``.
+
+    Products, sellers and categories are created first; sales are spread over
+    the last ``days`` days with 1..2*``items_per_sale`` lines each. Rollups and
+    counters are rebuilt at the end and the stock ledger is kept consistent.
+    """
+    log = log or (lambda msg: None)
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(None)
+
+    cats = Category.objects.bulk_create(
+        [Category(name=f'{prefix} category {i:04d}') for i in range(categories)], batch_size=batch_size,
+    )
+    log(f'{len(cats)} categories')
+
+    product_objs = []
+    for start, n in _chunks(products, batch_size):
+        batch = [
+            Product(
+                name=f'{prefix} product {i:07d}', sku=f'{prefix}-{i:07d}',
+                category=rng.choice(cats) if cats else None,
+                price=Decimal(rng.randint(50, 50000)) / 100, stock=0,
+            )
+            for i in range(start, start + n)
+        ]
+        product_objs.extend(Product.objects.bulk_create(batch))
+    log(f'{len(product_objs)} products')
+
+    seller_objs = User.objects.bulk_create(
+        [User(username=f'{prefix}-seller-{i:04d}', password=password) for i in range(sellers)], batch_size=batch_size,
+    )
+    log(f'{len(seller_objs)} sellers')
+
+    sold = [0] * len(product_objs)
+    span = int(timedelta(days=days).total_seconds())
+    items_total = 0
+    with _historical_timestamps():
+        for start, n in _chunks(sales, batch_size):
+            with transaction.atomic():
+                baskets, sale_batch = [], []
+                for _ in range(n):
+                    lines = {}
+                    for _ in range(rng.randint(1, max(1, 2 * items_per_sale - 1))):
+                        idx = rng.randrange(len(product_objs))
+                        lines[idx] = lines.get(idx, 0) + rng.randint(1, 3)
+                    baskets.append(lines)
+                    sale_batch.append(Sale(
+                        seller=rng.choice(seller_objs) if seller_objs else None,
+                        created_at=now - timedelta(seconds=rng.randrange(span)),
+                        total=sum(product_objs[i].price * q for i, q in lines.items()),
+                    ))
+                created = Sale.objects.bulk_create(sale_batch)
+                items = []
+                for sale, lines in zip(created, baskets):
+                    for idx, qty in lines.items():
+                        sold[idx] += qty
+                        items.append(SaleItem(sale=sale, product=product_objs[idx], quantity=qty, price=product_objs[idx].price))
+                SaleItem.objects.bulk_create(items, batch_size=batch_size)
+                items_total += len(items)
+            log(f'{start + n}/{sales} sales, {items_total} items')
+
+    # Opening stock covers everything sold plus some headroom; log both sides in the ledger
+    movements = []
+    for product, qty in zip(product_objs, sold):
+        opening = qty + rng.randint(0, 200)
+        product.stock = opening - qty
+        movements.append(StockMovement(product=product, kind=StockMovement.RESTOCK, quantity=opening, note='Seed opening stock'))
+        if qty:
+            movements.append(StockMovement(product=product, kind=StockMovement.SALE, quantity=-qty, note='Seeded sales'))
+    Product.objects.bulk_update(product_objs, ['stock'], batch_size=batch_size)
+    StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+
+    rollups.rebuild()
+    rollups.rebuild_product_sales()
+    valuation.rebuild()
+    log('rollups and stock valuation rebuilt')
+    return {
+        'categories': len(cats), 'products': len(product_objs), 'sellers': len(seller_objs),
+        'sales': sales, 'items': items_total,
+    }
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump, CATALOG, PRODUCTS, SALES, USERS
+from . import lookup, valuation
+from .models import Category, CategoryValuation, Product, Sale, SaleItem
+
+
+# Signals fire inside the writer's transaction. Bumping there would let a concurrent reader
+# rebuild the old rows and cache them under the new version, so every bump waits for the commit.
+
+@receiver([post_save, post_delete], sender=Sale)
+@receiver([post_save, post_delete], sender=SaleItem)
+def sales_changed(sender, using, **kwargs):
+    transaction.on_commit(lambda: bump(SALES), using=using)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, using, **kwargs):
+    transaction.on_commit(lambda: bump(CATALOG), using=using)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, using, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: (lookup.invalidate(pk), bump(PRODUCTS)), using=using)
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    # Take the row's current values out of the stock valuation, not the possibly stale instance's
+    row = Product.objects.filter(pk=instance.pk).values_list('category_id', 'stock', 'price').first()
+    if row:
+        change = valuation.changes()
+        valuation.add_product(change, *row, sign=-1)
+        valuation.apply(change)
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # Its products become uncategorised (SET_NULL, which sends no signals), so move its totals too,
+    # and mark them changed so the catalog API's validators move although the category is gone
+    Product.objects.filter(category=instance).update(updated_at=timezone.now())
+    row = CategoryValuation.objects.filter(category=instance).values_list('products', 'units', 'value').first()
+    if row:
+        change = valuation.changes()
+        change[None] = list(row)
+        valuation.apply(change)
+
+
+@receiver([post_save, post_delete], sender=User)
+def users_changed(sender, using, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no cached user listing shows
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        transaction.on_commit(lambda: bump(USERS), using=using)
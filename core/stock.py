@@ -0,0 +1,150 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+from . import valuation
+
+
+class NegativeStock(ValueError):
+    pass
+
+
+def record_sale(sale, basket):
+    """Append one SALE movement per basket line (``{product_id: quantity}``) in a single INSERT."""
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=pid, kind=StockMovement.SALE, quantity=-qty, sale=sale, user_id=sale.seller_id)
+        for pid, qty in basket.items()
+    ])
+
+
+def change_stock(product, delta, kind=StockMovement.ADJUSTMENT, user=None, note=''):
+    """
+    Apply ``delta`` to ``product.stock`` as an in-place ``F()`` update and log it.
+
+    Unlike saving a form's absolute value this never overwrites sales that
+    happened while the form was open.
+    """
+    if not delta:
+        return product.stock
+    with transaction.atomic():
+        guard = {'stock__gte': -delta} if delta < 0 else {}
+        if not Product.objects.filter(pk=product.pk, **guard).update(stock=F('stock') + delta, updated_at=timezone.now()):
+            raise NegativeStock(f'Not enough stock in {product.name} to remove {-delta}')
+        StockMovement.objects.create(product=product, kind=kind, quantity=delta, user=user, note=note)
+        change = valuation.changes()
+        valuation.add_stock(change, product.category_id, delta, product.price)
+        valuation.apply(change)
+        product.stock = Product.objects.values_list('stock', flat=True).get(pk=product.pk)
+    return product.stock
+
+
+def save_product(product, previous_stock, user=None, note=''):
+    """
+    Save a product edited through a form or the admin.
+
+    Every field but ``stock`` is written as-is; the stock edit is applied as
+    the difference from what the editor saw, via ``change_stock``.
+    """
+    target = product.stock
+    change = valuation.changes()
+    with transaction.atomic():
+        if product._state.adding:
+            product.stock = 0
+            product.save()
+            previous_stock = 0
+            kind, note = StockMovement.RESTOCK, note or 'Initial stock'
+        else:
+            # Lock the row and take out its old category/price before writing the new ones
+            old_category, old_price, old_stock = (
+                Product.objects.select_for_update().values_list('category_id', 'price', 'stock').get(pk=product.pk)
+            )
+            valuation.add_product(change, old_category, old_stock, old_price, sign=-1)
+            product.save(update_fields=[f.name for f in product._meta.concrete_fields if not f.primary_key and f.name != 'stock'])
+            kind = StockMovement.ADJUSTMENT
+        product.stock = Product.objects.values_list('stock', flat=True).get(pk=product.pk)
+        valuation.add_product(change, product.category_id, product.stock, product.price)
+        valuation.apply(change)
+        change_stock(product, target - previous_stock, kind=kind, user=user, note=note)
+    return product
+
+
+def on_hand(product_ids=None):
+    """
+    Current stock per product id from the ledger alone: the last snapshot plus
+    the movements recorded since it. Two queries regardless of how many ids.
+    """
+    snaps = StockSnapshot.objects.all()
+    moves = StockMovement.objects.all()
+    if product_ids is not None:
+        snaps = snaps.filter(product_id__in=product_ids)
+        moves = moves.filter(product_id__in=product_ids)
+    result = {}
+    watermark = {}
+    for pid, qty, mid in snaps.values_list('product_id', 'quantity', 'movement_id'):
+        result[pid] = qty
+        watermark[pid] = mid
+    # Folds are global, so every snapshot shares the same watermark
+    since = max(watermark.values(), default=0)
+    for row in moves.filter(id__gt=since).values('product_id').order_by().annotate(delta=Sum('quantity')):
+        result[row['product_id']] = result.get(row['product_id'], 0) + row['delta']
+    if product_ids is not None:
+        for pid in product_ids:
+            result.setdefault(pid, 0)
+    return result
+
+
+def _horizon(since):
+    """
+    The highest movement id that can be folded: no transaction still open may
+    later commit a movement below it, or ``fold`` and ``on_hand`` would skip it.
+    """
+    connection = connections[StockMovement.objects.db]
+    moves = StockMovement.objects.filter(id__gt=since)
+    if connection.vendor == 'postgresql':
+        # Ids are drawn from a sequence at INSERT time, so a lower id can commit after a higher one.
+        # This mode waits out every transaction that has inserted a movement, holds new inserts
+        # off until the fold commits, and keeps a second fold out.
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {StockMovement._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+    elif connection.vendor != 'sqlite':
+        # SQLite has a single writer, so its ids commit in order; elsewhere leave recent rows to a later fold
+        moves = moves.filter(created_at__lte=timezone.now() - timedelta(seconds=settings.STOCK_FOLD_LAG))
+    return moves.aggregate(m=Max('id'))['m']
+
+
+def fold():
+    """Fold the movements recorded since the last fold into the snapshots; returns the new watermark."""
+    with transaction.atomic():
+        since = StockSnapshot.objects.aggregate(m=Max('movement_id'))['m'] or 0
+        upto = _horizon(since)
+        if upto is None:
+            return since
+        deltas = dict(
+            StockMovement.objects.filter(id__gt=since, id__lte=upto)
+            .values('product_id').order_by().annotate(delta=Sum('quantity'))
+            .values_list('product_id', 'delta')
+        )
+        existing = StockSnapshot.objects.in_bulk(deltas.keys(), field_name='product_id')
+        for pid, snap in existing.items():
+            snap.quantity += deltas[pid]
+        StockSnapshot.objects.bulk_update(existing.values(), ['quantity'], batch_size=1000)
+        StockSnapshot.objects.bulk_create(
+            [StockSnapshot(product_id=pid, quantity=delta) for pid, delta in deltas.items() if pid not in existing],
+            batch_size=1000,
+        )
+        StockSnapshot.objects.update(movement_id=upto)
+    return upto
+
+
+def check():
+    """Return ``[(product_id, product_stock, ledger_stock)]`` for products whose ledger disagrees with Product.stock."""
+    ledger = on_hand()
+    return [
+        (pid, stock, ledger.get(pid, 0))
+        for pid, stock in Product.objects.values_list('id', 'stock').iterator(chunk_size=2000)
+        if stock != ledger.get(pid, 0)
+    ]
@@ -0,0 +1,86 @@
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from .checkout import checkout, CheckoutError, InsufficientStock, UnknownProduct
+from .models import Sale
+
+MAX_BATCH = 200
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'
+INSUFFICIENT_STOCK = 'insufficient_stock'
+REJECTED = 'rejected'
+
+
+class BatchError(ValueError):
+    pass
+
+
+LINES_ERROR = 'Sale needs lines of {"product": id, "quantity": n}'
+
+
+def _parse(entry):
+    """``(key, lines, error)`` for one entry; a bad entry is rejected on its own, never the whole batch."""
+    if not isinstance(entry, dict):
+        return None, None, 'Each sale must be an object'
+    try:
+        key = uuid.UUID(str(entry.get('id')))
+    except ValueError:
+        return None, None, f'Invalid sale id {entry.get("id")!r}'
+    lines = entry.get('lines')
+    if not isinstance(lines, list) or not lines:
+        return key, None, LINES_ERROR
+    try:
+        return key, [(int(line['product']), int(line['quantity'])) for line in lines], None
+    except (KeyError, TypeError, ValueError):
+        return key, None, LINES_ERROR
+
+
+def sync_sales(seller, entries):
+    """
+    Apply a batch of offline sales in one transaction, one savepoint per sale.
+
+    ``entries`` is a list of ``{"id": <uuid>, "lines": [{"product": id, "quantity": n}]}``.
+    Returns one result dict per entry, in order. Sales whose id was already
+    recorded come back as duplicates with the original sale id, so a till can
+    retry a batch as often as it likes without charging stock twice. A
+    malformed entry is rejected with the id it was sent with and the rest
+    of the batch still applies.
+    """
+    if not isinstance(entries, list):
+        raise BatchError('Expected a list of sales')
+    if len(entries) > MAX_BATCH:
+        raise BatchError(f'At most {MAX_BATCH} sales per batch')
+    parsed = [_parse(entry) for entry in entries]
+
+    results = []
+    with transaction.atomic():
+        known = dict(
+            Sale.objects.filter(client_uuid__in=[k for k, _, _ in parsed if k]).values_list('client_uuid', 'id')
+        )
+        for entry, (key, lines, error) in zip(entries, parsed):
+            if key is None:
+                results.append({'id': entry.get('id') if isinstance(entry, dict) else None, 'status': REJECTED, 'error': error})
+                continue
+            result = {'id': str(key)}
+            if key in known:
+                result.update(status=DUPLICATE, sale_id=known[key])
+            elif error:
+                result.update(status=REJECTED, error=error)
+            else:
+                try:
+                    sale = checkout(seller, lines, client_uuid=key)
+                except InsufficientStock as exc:
+                    result.update(status=INSUFFICIENT_STOCK, product=exc.product.pk, error=str(exc))
+                except UnknownProduct as exc:
+                    result.update(status=REJECTED, products=exc.product_ids, error=str(exc))
+                except CheckoutError as exc:
+                    result.update(status=REJECTED, error=str(exc))
+                except IntegrityError:
+                    # Another request recorded the same id after our lookup
+                    result.update(status=DUPLICATE, sale_id=Sale.objects.values_list('id', flat=True).get(client_uuid=key))
+                else:
+                    known[key] = sale.pk
+                    result.update(status=ACCEPTED, sale_id=sale.pk, total=str(sale.total))
+            results.append(result)
+    return results
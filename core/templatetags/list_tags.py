@@ -0,0 +1,16 @@
+from django import template
+from django.utils.html import format_html
+register = template.Library()
+
+@register.simple_tag
+def sort_header(listing, key, label):
+    # Clicking the active column flips its direction; any new sort starts again at page 1
+    current = listing.sort.lstrip('-')
+    desc = listing.sort.startswith('-')
+    target = f'-{key}' if key == current and not desc else key
+    arrow = (' ▼' if desc else ' ▲') if key == current else ''
+    return format_html('<a href="?{}" class="text-reset">{}{}</a>', listing.query_string(sort=target, page=None), label, arrow)
+
+@register.simple_tag
+def page_query(listing, number):
+    return listing.query_string(page=number)
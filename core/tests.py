@@ -0,0 +1,483 @@
+import asyncio
+import io
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, IntegrityError, OperationalError, router
+from django.http import HttpResponse
+from django.test import Client, override_settings, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from . import archive, backends, imports, lookup, printing, reports, routing, stock
+from .cache import bump, versions, CATALOG, PRODUCTS, SALES
+from .checkout import checkout, CheckoutError
+from .models import Category, DailySales, Product, Sale, SaleItem, StockMovement
+
+
+class CheckoutQueryCountTests(TestCase):
+    # Savepoint, locking SELECT, stock UPDATE, Sale, SaleItem and ledger INSERTs, four
+    # two-query rollup upserts, the two valuation queries and the release: 17 at any basket size
+    QUERIES = 17
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='x')
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', price=Decimal('2.50'), stock=100) for i in range(20)
+        ])
+
+    def assertCheckoutQueries(self, lines):
+        with self.assertNumQueries(self.QUERIES):
+            sale = checkout(self.seller, [(p.pk, 2) for p in self.products[:lines]])
+        self.assertEqual(sale.items.count(), lines)
+        self.assertEqual(sale.total, Decimal('5.00') * lines)
+
+    def test_one_line(self):
+        self.assertCheckoutQueries(1)
+
+    def test_five_lines(self):
+        self.assertCheckoutQueries(5)
+
+    def test_twenty_lines(self):
+        self.assertCheckoutQueries(20)
+
+    def test_stock_never_goes_negative(self):
+        product = self.products[0]
+        with self.assertRaises(Exception):
+            checkout(self.seller, [(product.pk, 101)])
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 100)
+        self.assertFalse(Sale.objects.exists())
+
+
+class CacheVersionTests(TestCase):
+    def test_bumps_wait_for_the_commit(self):
+        before = versions(SALES, CATALOG, PRODUCTS)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            stock.save_product(Product(name='Cola', price=Decimal('1.20'), stock=5), 0)
+            # A reader before the commit must still see the old versions, or it could cache the old rows under the new ones
+            self.assertEqual(versions(SALES, CATALOG, PRODUCTS), before)
+        self.assertTrue(callbacks)
+        after = versions(SALES, CATALOG, PRODUCTS)
+        self.assertEqual(after[0], before[0])
+        self.assertNotEqual(after[1:], before[1:])
+
+
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Drinks')
+        Product.objects.create(name='Cola', category=self.category, price=Decimal('1.20'), stock=5)
+        self.client.force_login(User.objects.create_user('seller', password='x'))
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.client.get('/api/catalog/')['ETag']
+        self.assertEqual(self.client.get('/api/catalog/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_renamed_category_is_a_change(self):
+        first = self.client.get('/api/catalog/')
+        self.category.name = 'Soft drinks'
+        self.category.save()
+        response = self.client.get(
+            '/api/catalog/', HTTP_IF_NONE_MATCH=first['ETag'], HTTP_IF_MODIFIED_SINCE=first['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['category'], 'Soft drinks')
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('manager', password='x', is_staff=True))
+
+    def upload(self, content, name='catalog.csv', dry_run=False):
+        data = {'file': SimpleUploadedFile(name, content)}
+        if dry_run:
+            data['dry_run'] = 'on'
+        return self.client.post('/products/import/', data)
+
+    def test_non_utf8_file_is_a_form_error(self):
+        response = self.upload('sku,name,price\n1,Café,1.00\n'.encode('latin-1'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Unreadable file')
+        self.assertFalse(Product.objects.exists())
+
+    def test_conflicting_chunk_is_reported(self):
+        with mock.patch.object(Product.objects, 'bulk_create', side_effect=IntegrityError('UNIQUE constraint failed: core_product.sku')):
+            response = self.upload(b'sku,name,price\nA1,Cola,1.00\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'conflict with another write')
+        self.assertEqual(response.context['result'].created, 0)
+
+    def test_dry_run_keeps_only_the_first_changes(self):
+        rows = ''.join(f'S{i},Product {i},1.00\n' for i in range(50))
+        result = imports.import_products(imports.iter_csv(io.StringIO('sku,name,price\n' + rows)), dry_run=True, max_changes=10)
+        self.assertEqual(result.created, 50)
+        self.assertEqual(len(result.changes), 10)
+        self.assertEqual(result.changes_omitted, 40)
+        self.assertFalse(Product.objects.exists())
+
+
+class SyncApiTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Cola', price=Decimal('1.20'), stock=5)
+        self.client.force_login(User.objects.create_user('seller', password='x'))
+
+    def sync(self, sales):
+        response = self.client.post('/api/sync/', json.dumps({'sales': sales}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return [(r['id'], r['status']) for r in response.json()['results']]
+
+    def test_malformed_entries_do_not_block_the_batch(self):
+        good = str(uuid.uuid4())
+        line = [{'product': self.product.pk, 'quantity': 2}]
+        results = self.sync([{'id': 'not-a-uuid', 'lines': line}, 'junk', {'id': good, 'lines': line}])
+        self.assertEqual(results, [('not-a-uuid', 'rejected'), (None, 'rejected'), (good, 'accepted')])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        # The till retries the whole queue: the good sale is a duplicate, never charged twice
+        self.assertEqual(self.sync([{'id': good, 'lines': line}]), [(good, 'duplicate')])
+
+
+class ArchiveTests(TestCase):
+    def test_archived_month_keeps_rollups_and_bumps_sales_on_commit(self):
+        seller = User.objects.create_user('seller', password='x')
+        product = stock.save_product(Product(name='Cola', price=Decimal('1.50'), stock=20), 0)
+        sales = [checkout(seller, [(product.pk, 2)]) for _ in range(3)]
+        month = timezone.localdate().replace(day=1)
+        before = versions(SALES)
+
+        with tempfile.TemporaryDirectory() as directory, self.captureOnCommitCallbacks(execute=True):
+            period = archive.archive_month(month, directory)
+            self.assertEqual(versions(SALES), before)
+
+        self.assertNotEqual(versions(SALES), before)
+        self.assertEqual((period.sales, period.items, period.total), (3, 3, Decimal('9.00')))
+        self.assertFalse(Sale.objects.exists() or SaleItem.objects.exists())
+        self.assertEqual(StockMovement.objects.filter(sale__isnull=True, kind=StockMovement.SALE).count(), 3)
+        self.assertEqual(DailySales.objects.get().count, len(sales))
+
+
+class ReportPdfTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        pdf_settings = override_settings(PDF_CACHE_DIR=directory.name)
+        pdf_settings.enable()
+        self.addCleanup(pdf_settings.disable)
+        self.reports_dir = os.path.join(directory.name, 'reports')
+        self.seller = User.objects.create_user('seller', password='x')
+        self.product = stock.save_product(Product(name='Cola', price=Decimal('1.50'), stock=20), 0)
+        self.client.force_login(User.objects.create_user('manager', password='x', is_staff=True))
+
+    def sell(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout(self.seller, [(self.product.pk, 1)])
+
+    def test_new_sales_replace_the_cached_report(self):
+        for _ in range(3):
+            self.sell()
+            response = self.client.get('/reports/sales.pdf')
+            self.assertEqual(response.status_code, 200)
+            response.close()
+        self.assertEqual(len(os.listdir(self.reports_dir)), 1)
+
+    def test_failed_report_is_logged_and_offers_a_retry(self):
+        self.sell()
+        with mock.patch.object(printing, '_render_report', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('core.views', 'ERROR'):
+            response = self.client.get('/reports/sales.pdf')
+        self.assertContains(response, 'Try again', status_code=500)
+        self.assertEqual(self.client.get('/reports/sales.pdf').status_code, 200)
+
+    @override_settings(PDF_INLINE_SALES=0)
+    def test_failed_background_report_is_reported_once(self):
+        self.addCleanup(printing._jobs.clear)
+        self.sell()
+        with mock.patch.object(printing, '_render_report', side_effect=RuntimeError('disk full')):
+            self.assertEqual(self.client.get('/reports/sales.pdf').status_code, 202)
+            for job in list(printing._jobs.values()):
+                job.exception(timeout=5)  # failed jobs stay queued until a request surfaces them
+            with self.assertLogs('core.views', 'ERROR'):
+                self.assertContains(self.client.get('/reports/sales.pdf'), 'Try again', status_code=500)
+            self.assertEqual(self.client.get('/reports/sales.pdf').status_code, 202)
+
+
+class ScanLookupTests(TestCase):
+    def setUp(self):
+        lookup.clear()
+        self.product = Product.objects.create(name='Cola', sku='5000112', price=Decimal('1.20'), stock=10)
+
+    def test_repeat_scans_are_served_from_the_cache(self):
+        lookup.resolve(['5000112'])
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup.resolve(['5000112'])['5000112']['price'], '1.20')
+
+    def test_edit_in_another_process_is_seen_on_the_next_scan(self):
+        lookup.resolve(['5000112'])
+        # Another worker saved the product: the row and the shared version change, this LRU doesn't
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('1.50'))
+        bump(PRODUCTS)
+        self.assertEqual(lookup.resolve(['5000112'])['5000112']['price'], '1.50')
+
+
+class StockLedgerConcurrencyTests(TransactionTestCase):
+    THREADS = 8
+    ATTEMPTS = 20
+
+    def test_many_tills_on_one_product(self):
+        seller = User.objects.create_user('seller', password='x')
+        product = stock.save_product(Product(name='Best seller', price=Decimal('1.00'), stock=100), 0)
+        sold, errors = [], []
+
+        def retry(fn, *args):
+            # SQLite's shared in-memory test database refuses concurrent writers instead of waiting
+            while True:
+                try:
+                    return fn(*args)
+                except OperationalError:
+                    time.sleep(0.001)
+
+        def till(n):
+            try:
+                for i in range(self.ATTEMPTS):
+                    qty = 1 + (n + i) % 3
+                    try:
+                        retry(checkout, seller, [(product.pk, qty)])
+                        sold.append(qty)
+                    except CheckoutError:
+                        pass
+                    if n == 0 and i % 5 == 0:
+                        retry(stock.fold)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=till, args=(n,)) for n in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        # The tills ask for about 320 units, so the 100 in stock sell out without ever going negative
+        self.assertGreater(sum(sold), 95)
+        self.assertEqual(product.stock, 100 - sum(sold))
+        self.assertEqual(StockMovement.objects.filter(product=product, kind=StockMovement.SALE).count(), len(sold))
+        self.assertEqual(stock.on_hand([product.pk]), {product.pk: product.stock})
+        stock.fold()
+        self.assertEqual(stock.check(), [])
+
+
+class AdminChangelistQueryTests(TestCase):
+    # Per changelist: the session and user reads, COUNT(*) and the page (plus the date
+    # hierarchy for sales and the category filter for products); never one per row
+    QUERIES = {'sale': 6, 'saleitem': 4, 'product': 5, 'stockmovement': 4}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='x')
+        cls.sellers = [User.objects.create_user(f'seller{i}', password='x') for i in range(3)]
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+        cls.products = [
+            stock.save_product(Product(name=f'Product {i}', category=categories[i % 3], price=Decimal('2.00'), stock=500), 0)
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def sell(self, n):
+        # Real checkouts, so line items and movements point at sales, sellers and products
+        for i in range(n):
+            checkout(self.sellers[i % 3], [(p.pk, 1) for p in self.products[i % 12:i % 12 + 3]])
+
+    def assertChangelistQueries(self):
+        for name, queries in self.QUERIES.items():
+            with self.subTest(changelist=name), self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(f'/admin/core/{name}/').status_code, 200)
+
+    def test_five_sales(self):
+        self.sell(5)
+        self.assertChangelistQueries()
+
+    def test_forty_sales(self):
+        self.sell(40)
+        self.assertChangelistQueries()
+
+
+class ReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='x')
+        cls.products = [stock.save_product(Product(name=f'Product {i}', price=Decimal(i + 1), stock=10), 0) for i in range(6)]
+        for product in cls.products:
+            checkout(cls.seller, [(product.pk, 2), (cls.products[0].pk, 1)])
+
+    def test_bounded_reports_use_index_ranges(self):
+        # Every grouping under every filter combination; plans don't depend on the filter values existing
+        for group, seller, category, product in itertools.product(reports.GROUPINGS, [None, 1], [None, 1], [None, 1]):
+            query = reports.ReportQuery(seller=seller, category=category, product=product, group=group)
+            with self.subTest(params=query.params()):
+                vendor, plan = reports.explain(query)
+                self.assertEqual(reports.full_scans(vendor, plan), [], '\n'.join(plan))
+
+    def test_cut_groupings_keep_full_totals(self):
+        query = reports.ReportQuery(group='product')
+        full = reports.run(query)
+        self.assertFalse(full['truncated'])
+        with mock.patch.object(reports, 'ROW_LIMIT', 2):
+            cut = reports.run(query)
+        self.assertTrue(cut['truncated'])
+        self.assertEqual(len(cut['rows']), 2)
+        self.assertEqual(cut['totals'], full['totals'])
+        self.assertEqual(cut['totals'], {'sales': 6, 'quantity': 18, 'total': Decimal('48.00')})
+
+
+# The test process's local-memory cache stands in for a shared one
+@override_settings(
+    AUTHENTICATION_BACKENDS=['core.backends.CachedModelBackend'],
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class CachedSessionUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        backends._users.clear()
+        self.staff = User.objects.create_user('manager', password='x', is_staff=True)
+        self.seller = User.objects.create_user('seller', password='x')
+        self.client.force_login(self.staff)
+
+    def seller_client(self):
+        client = Client()
+        client.force_login(self.seller)
+        self.assertEqual(client.get('/pos/').status_code, 200)
+        return client
+
+    def assertSentToLogin(self, response):
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith('/login/'))
+
+    def test_warm_request_reads_no_session_or_user(self):
+        Product.objects.create(name='Cola', sku='5000112', price=Decimal('1.20'))
+        client = self.seller_client()
+        client.get('/api/scan/5000112/')
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/scan/5000112/').status_code, 200)
+
+    def test_demoted_staff_loses_access_on_next_request(self):
+        manager = Client()
+        manager.force_login(self.staff)
+        self.assertEqual(manager.get('/users/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/users/{self.staff.pk}/edit/', {'username': 'manager', 'is_active': 'on'})
+        self.assertSentToLogin(manager.get('/users/'))
+
+    def test_deactivated_seller_loses_access_on_next_request(self):
+        client = self.seller_client()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/users/{self.seller.pk}/edit/', {'username': 'seller'})
+        self.assertSentToLogin(client.get('/pos/'))
+
+    def test_edit_in_another_worker_applies_on_next_request(self):
+        client = self.seller_client()
+        # Another worker saved the user: the shared version moves, this process's cached entry stays
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.is_active = False
+            self.seller.save()
+        self.assertSentToLogin(client.get('/pos/'))
+
+    def test_logout_ends_the_session_everywhere(self):
+        client = self.seller_client()
+        stolen = Client()
+        stolen.cookies = client.cookies.__class__(client.cookies)
+        client.get('/logout/')
+        self.assertSentToLogin(stolen.get('/pos/'))
+
+
+def _read_db(request):
+    return HttpResponse(router.db_for_read(Product))
+
+
+async def _async_read_db(request):
+    return HttpResponse(router.db_for_read(Product))
+
+
+@mock.patch.object(routing, 'replica_configured', return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def read_db(self, view, request=None):
+        return view(request or self.factory.get('/')).content.decode()
+
+    def test_reads_go_to_the_replica_only_inside_wrapped_views(self, configured):
+        self.assertEqual(router.db_for_read(Product), 'default')
+        self.assertEqual(self.read_db(routing.replica_reads(_read_db)), 'replica')
+        self.assertEqual(self.read_db(_read_db), 'default')
+        # The flag is reset once the view returns
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+    def test_async_views_are_routed_per_request(self, configured):
+        view = routing.replica_reads(_async_read_db)
+        pinned = self.factory.get('/')
+        pinned.COOKIES[routing.PIN_COOKIE] = '1'
+
+        async def both():
+            return await asyncio.gather(view(self.factory.get('/')), view(pinned))
+
+        replica, primary = async_to_sync(both)()
+        self.assertEqual((replica.content, primary.content), (b'replica', b'default'))
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+    def test_writes_always_go_to_the_primary(self, configured):
+        self.assertEqual(routing.replica_reads(lambda request: HttpResponse(router.db_for_write(Product)))(
+            self.factory.get('/')).content, b'default')
+
+    def test_unconfigured_replica_reads_the_primary(self, configured):
+        configured.return_value = False
+        self.assertEqual(self.read_db(routing.replica_reads(_read_db)), 'default')
+
+
+@mock.patch.object(routing, 'replica_configured', return_value=True)
+class PrimaryPinTests(TestCase):
+    def test_post_pins_the_browser_to_the_primary(self, configured):
+        self.assertNotIn(routing.PIN_COOKIE, self.client.get('/login/').cookies)
+        response = self.client.post('/login/', {'username': 'nobody', 'password': 'x'})
+        self.assertEqual(response.cookies[routing.PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        request = RequestFactory().get('/')
+        request.COOKIES.update({k: v.value for k, v in self.client.cookies.items()})
+        self.assertEqual(routing.replica_reads(_read_db)(request).content, b'default')
+        self.assertEqual(async_to_sync(routing.replica_reads(_async_read_db))(request).content, b'default')
+
+
+# A replica with a test database of its own: DATABASE_REPLICA_URL and REPLICA_TEST_MIRROR=False
+SEPARATE_REPLICA = (
+    routing.REPLICA in settings.DATABASES and not settings.DATABASES[routing.REPLICA].get('TEST', {}).get('MIRROR')
+)
+
+
+@unittest.skipUnless(SEPARATE_REPLICA, 'needs DATABASE_REPLICA_URL with REPLICA_TEST_MIRROR=False')
+class TwoDatabaseRoutingTests(TestCase):
+    # The runner sets up every alias a test names, skipped or not
+    databases = {'default', routing.REPLICA} if SEPARATE_REPLICA else {'default'}
+
+    def test_wrapped_views_read_the_replica_database(self):
+        Product.objects.create(name='On the primary', price=Decimal('1.00'))
+        Product.objects.using(routing.REPLICA).create(name='Only on the replica', price=Decimal('1.00'))
+        names = routing.replica_reads(lambda request: list(Product.objects.values_list('name', flat=True)))
+        self.assertEqual(names(RequestFactory().get('/')), ['Only on the replica'])
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['On the primary'])
@@ -0,0 +1,113 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import CategoryValuation, LOW_STOCK, Product
+
+FIELDS = (('products', IntegerField()), ('units', BigIntegerField()), ('value', DecimalField(max_digits=18, decimal_places=2)))
+
+
+def changes():
+    """An empty ``{category_id: [products, units, value]}`` accumulator for ``apply``."""
+    return defaultdict(lambda: [0, 0, Decimal(0)])
+
+
+def add_product(delta, category_id, stock, price, sign=1):
+    """Count a whole product in (``sign=1``) or out (``sign=-1``) of its category."""
+    row = delta[category_id]
+    row[0] += sign
+    row[1] += sign * stock
+    row[2] += sign * stock * price
+
+
+def add_stock(delta, category_id, quantity, price):
+    row = delta[category_id]
+    row[1] += quantity
+    row[2] += quantity * price
+
+
+def _match(category_id):
+    return Q(category__isnull=True) if category_id is None else Q(category_id=category_id)
+
+
+def apply(delta):
+    """
+    Add ``delta`` to the stored summary in two queries however many categories
+    it touches: create any missing rows, then one in-place ``F()`` update so
+    concurrent tills never lose an increment. Call inside the writing transaction.
+    """
+    rows = {cat: values for cat, values in delta.items() if any(values)}
+    if not rows:
+        return
+    CategoryValuation.objects.bulk_create([CategoryValuation(category_id=cat) for cat in rows], ignore_conflicts=True)
+    updates = {
+        name: Case(
+            *[When(_match(cat), then=F(name) + Value(values[i], output_field=field)) for cat, values in rows.items()],
+            default=F(name), output_field=field,
+        )
+        for i, (name, field) in enumerate(FIELDS)
+    }
+    CategoryValuation.objects.filter(reduce(or_, map(_match, rows))).update(**updates, updated_at=timezone.now())
+
+
+def record_sale(products, basket):
+    """Take a checkout's ``basket`` (``{product_id: quantity}``) out of stock value; ``products`` are the locked rows."""
+    delta = changes()
+    for pid, qty in basket.items():
+        add_stock(delta, products[pid].category_id, -qty, products[pid].price)
+    apply(delta)
+
+
+def compute():
+    """The summary recomputed from ``Product``, as ``{category_id: (products, units, value)}``."""
+    rows = (
+        Product.objects.values('category_id').order_by()
+        .annotate(n=Count('id'), units=Sum('stock'), value=Sum(F('stock') * F('price')))
+    )
+    return {
+        row['category_id']: (row['n'], row['units'] or 0, (row['value'] or Decimal(0)).quantize(Decimal('0.01')))
+        for row in rows
+    }
+
+
+def stored():
+    return {
+        row.category_id: (row.products, row.units, row.value)
+        for row in CategoryValuation.objects.all()
+    }
+
+
+def check():
+    """Return ``[(category_id, expected, stored)]`` for categories whose summary row has drifted."""
+    expected, have = compute(), stored()
+    empty = (0, 0, Decimal('0.00'))
+    return [
+        (cat, expected.get(cat, empty), have.get(cat, empty))
+        for cat in sorted(set(expected) | set(have), key=lambda c: (c is not None, c or 0))
+        if expected.get(cat, empty) != have.get(cat, empty)
+    ]
+
+
+def rebuild():
+    """Replace the summary with a full recomputation; returns the number of category rows."""
+    with transaction.atomic():
+        # Lock the products so no sale lands between the recount and the swap
+        list(Product.objects.select_for_update().values_list('id', flat=True))
+        rows = compute()
+        CategoryValuation.objects.all().delete()
+        CategoryValuation.objects.bulk_create([
+            CategoryValuation(category_id=cat, products=n, units=units, value=value)
+            for cat, (n, units, value) in rows.items()
+        ])
+    return len(rows)
+
+
+def low_stock(limit=None):
+    """Active products at or below their reorder level, emptiest first; an index range whatever the catalog size."""
+    qs = Product.objects.filter(LOW_STOCK).select_related('category').order_by('stock', 'pk')
+    return qs[:limit] if limit else qs
@@ -1,18 +1,45 @@
 
+import hashlib
+import hmac
+import io
+import json
+import logging
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib import messages
-from django.db import transaction, models
-from django.db.models import Sum
+from django.db import models
+from django.db.models import Prefetch, Q
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_POST
+
+from .models import Category, CategoryValuation, LOW_STOCK, Product, Sale, SaleItem, DailySales, RestockSuggestion
+from .aio import gather_queries
+from .cache import aget_or_build, get_or_build, stats as cache_counters, CATALOG, SALES, USERS
+from .backends import invalidate_user
+from .checkout import checkout, CheckoutError, UnknownProduct
+from . import events, exports, imports, lookup, metrics, printing, reports, stock, sync, valuation
+from .routing import read_alias, replica_reads
+from .forms import LoginForm, CategoryForm, ProductForm, ProductImportForm, UserForm
+from .rollups import top_products
+from .listing import Listing
+from .pagination import keyset_paginate, InvalidCursor
 
-from .models import Category, Product, Sale, SaleItem
-from .forms import LoginForm, CategoryForm, ProductForm, UserForm
+logger = logging.getLogger(__name__)
 from .permissions import admin_required, seller_required
 
 User = get_user_model()
 
+SALES_PER_PAGE = 50
+
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
@@ -29,46 +56,65 @@ def logout_view(request):
     logout(request)
     return redirect('login')
 
+def _dashboard_queries(user):
+    # Independent aggregates: the sync view runs them in turn, the async one concurrently
+    today = timezone.localdate()
+    queries = {
+        'product_count': Product.objects.count,
+        # From the rollups, which also cover archived months
+        'total_sales': lambda: DailySales.objects.aggregate(n=models.Sum('count'))['n'] or 0,
+        'latest_sales': lambda: list(Sale.objects.select_related('seller').order_by('-created_at')[:5]),
+        # Daily total (sum of today's sales), read from the rollup
+        'daily_total': lambda: DailySales.objects.filter(day=today).values_list('total', flat=True).first() or 0,
+        # Most bought product and this week's best sellers, from the per-product counters
+        'top': lambda: top_products(limit=1),
+        'top_week': lambda: top_products(days=7, limit=5),
+    }
+    if not user.is_staff:
+        queries['seller_sales'] = Sale.objects.filter(seller=user).count
+    return queries
+
+def _dashboard_context(results):
+    top = results.pop('top')
+    results['most_bought'] = top[0]['product__name'] if top else None
+    results.setdefault('seller_sales', None)
+    return results
+
+def _dashboard_stats(user):
+    return _dashboard_context({name: run() for name, run in _dashboard_queries(user).items()})
+
+def _dashboard_cache_name(user):
+    # Stats are cached per role (staff share one entry, each seller gets their own)
+    return 'dashboard:staff' if user.is_staff else f'dashboard:seller:{user.pk}'
+
 @login_required
+@replica_reads
 def dashboard(request):
-    # Simple dashboard with key stats
-    product_count = Product.objects.count()
-    seller_sales = Sale.objects.filter(seller=request.user).count() if not request.user.is_staff else None
-    total_sales = Sale.objects.count()
-    latest_sales = Sale.objects.order_by('-created_at')[:5]
+    user = request.user
+    stats = get_or_build(_dashboard_cache_name(user), (SALES, CATALOG), lambda: _dashboard_stats(user))
+    return render(request, 'core/dashboard.html', stats)
 
-    # Daily total (sum of today's sales)
-    today = timezone.localdate()
-    daily_total = Sale.objects.filter(created_at__date=today).aggregate(total=models.Sum('total'))['total'] or 0
-
-    # Most bought product
-    most_bought_item = (
-        SaleItem.objects
-        .values('product__name')
-        .annotate(total_sold=Sum('quantity'))
-        .order_by('-total_sold')
-        .first()
-    )
+@login_required
+@replica_reads
+async def dashboard_async(request):
+    user = await request.auser()
 
-    # Format for easy display
-    most_bought = None
-    if most_bought_item:
-        most_bought = f"{most_bought_item['product__name']}"
-
-    return render(request, 'core/dashboard.html', {
-        'product_count': product_count,
-        'seller_sales': seller_sales,
-        'total_sales': total_sales,
-        'latest_sales': latest_sales,
-        'daily_total': daily_total,
-        'most_bought': most_bought,
-    })
+    async def build():
+        return _dashboard_context(await gather_queries(_dashboard_queries(user)))
+
+    stats = await aget_or_build(_dashboard_cache_name(user), (SALES, CATALOG), build)
+    # Rendering touches request.user and the session lazily, which must happen off the event loop
+    return await sync_to_async(render)(request, 'core/dashboard.html', stats)
 
 # ----- Admin: Categories -----
 @admin_required
 def category_list(request):
-    categories = Category.objects.order_by('name')
-    return render(request, 'core/category_list.html', {'categories': categories})
+    listing = Listing(
+        request, Category.objects.all(), 'categories', (CATALOG,),
+        sorts={'name': ['name'], 'id': ['pk']}, default='name',
+        search=lambda qs, term: qs.filter(name__istartswith=term),
+    )
+    return render(request, 'core/category_list.html', {'categories': listing, 'listing': listing})
 
 @admin_required
 def category_create(request):
@@ -101,14 +147,42 @@ def category_delete(request, pk):
 # ----- Admin: Products -----
 @admin_required
 def product_list(request):
-    products = Product.objects.select_related('category').order_by('name')
-    return render(request, 'core/product_list.html', {'products': products})
+    qs = Product.objects.select_related('category')
+    status = request.GET.get('status', '')
+    if status not in PRODUCT_STATUSES:
+        status = ''
+    if status == 'active':
+        qs = qs.filter(is_active=True)
+    elif status == 'inactive':
+        qs = qs.filter(is_active=False)
+    elif status == 'low':
+        # Served by the low-stock partial index
+        qs = qs.filter(LOW_STOCK)
+    listing = Listing(
+        request, qs, 'products', (CATALOG,),
+        sorts={
+            'name': ['name'], 'sku': ['sku'], 'category': ['category__name'],
+            'price': ['price'], 'stock': ['stock'], 'id': ['pk'],
+        },
+        default='stock' if status == 'low' else 'name',
+        search=_search_products, filters={'status': status},
+    )
+    return render(request, 'core/product_list.html', {
+        'products': listing, 'listing': listing, 'status': status, 'statuses': PRODUCT_STATUSES,
+    })
+
+PRODUCT_STATUSES = {'': 'All', 'active': 'Active', 'inactive': 'Inactive', 'low': 'Low stock'}
+
+def _search_products(qs, term):
+    # Same name matching as the POS catalog, plus an exact scanner code
+    name = Q(name__icontains=term) if len(term) >= 3 else Q(name__istartswith=term)
+    return qs.filter(name | Q(sku=term))
 
 @admin_required
 def product_create(request):
     form = ProductForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
-        form.save()
+        stock.save_product(form.save(commit=False), 0, user=request.user)
         messages.success(request, 'Product created')
         return redirect('product_list')
     return render(request, 'core/product_form.html', {'form': form, 'title': 'New Product'})
@@ -118,11 +192,33 @@ def product_edit(request, pk):
     product = get_object_or_404(Product, pk=pk)
     form = ProductForm(request.POST or None, instance=product)
     if request.method == 'POST' and form.is_valid():
-        form.save()
+        # Stock is applied as the change from what the form showed, so sales made meanwhile survive
+        try:
+            stock.save_product(form.save(commit=False), form.previous_stock(), user=request.user)
+        except stock.NegativeStock as exc:
+            messages.error(request, str(exc))
+            return redirect('product_edit', pk=pk)
         messages.success(request, 'Product updated')
         return redirect('product_list')
     return render(request, 'core/product_form.html', {'form': form, 'title': 'Edit Product'})
 
+IMPORT_CHANGES_SHOWN = 200
+
+@admin_required
+def product_import(request):
+    form = ProductImportForm(request.POST or None, request.FILES or None)
+    result = None
+    if request.method == 'POST' and form.is_valid():
+        upload = form.cleaned_data['file']
+        fmt = 'json' if upload.name.lower().endswith(('.json', '.jsonl')) else 'csv'
+        records = imports.open_records(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''), fmt)
+        result = imports.import_products(
+            records, dry_run=form.cleaned_data['dry_run'], user=request.user, max_changes=IMPORT_CHANGES_SHOWN,
+        )
+        if not form.cleaned_data['dry_run']:
+            messages.success(request, f'Imported {result.created} new and {result.updated} updated products')
+    return render(request, 'core/product_import.html', {'form': form, 'result': result})
+
 @admin_required
 def product_delete(request, pk):
     product = get_object_or_404(Product, pk=pk)
@@ -135,8 +231,16 @@ def product_delete(request, pk):
 # ----- Admin: Users -----
 @admin_required
 def user_list(request):
-    users = User.objects.order_by('username')
-    return render(request, 'core/user_list.html', {'users': users})
+    listing = Listing(
+        request, User.objects.all(), 'users', (USERS,),
+        sorts={
+            'username': ['username'], 'name': ['first_name', 'last_name'], 'email': ['email'],
+            'is_staff': ['is_staff'], 'is_active': ['is_active'], 'id': ['pk'],
+        },
+        default='username',
+        search=lambda qs, term: qs.filter(Q(username__istartswith=term) | Q(email__istartswith=term)),
+    )
+    return render(request, 'core/user_list.html', {'users': listing, 'listing': listing})
 
 @admin_required
 def user_create(request):
@@ -172,6 +276,8 @@ def user_edit(request, pk):
         if pwd:
             user.set_password(pwd)
         user.save()
+        # Demotions and deactivations must apply to the user's very next request, in every worker
+        invalidate_user(user.pk)
         messages.success(request, 'User updated')
         return redirect('user_list')
     return render(request, 'core/user_form.html', {'form': form, 'title': 'Edit User'})
@@ -180,7 +286,9 @@ def user_edit(request, pk):
 def user_delete(request, pk):
     user = get_object_or_404(User, pk=pk)
     if request.method == 'POST':
+        user_id = user.pk
         user.delete()
+        invalidate_user(user_id)
         messages.success(request, 'User deleted')
         return redirect('user_list')
     return render(request, 'core/confirm_delete.html', {'object': user, 'back_url': 'user_list'})
@@ -188,9 +296,8 @@ def user_delete(request, pk):
 # ----- Seller: POS & Sales -----
 @seller_required
 def pos_view(request):
-    products = Product.objects.filter(is_active=True).order_by('name')
     if request.method == 'POST':
-        # expects POST with items[] = product_id|qty per line, or simple form fields
+        # expects one qty_<product id> field per basket line; the page only posts lines in the basket
         items = []
         for key, val in request.POST.items():
             if key.startswith('qty_'):
@@ -206,50 +313,274 @@ def pos_view(request):
             messages.error(request, 'No items selected')
             return redirect('pos')
 
-        with transaction.atomic():
-            sale = Sale.objects.create(seller=request.user, total=0)
-            total = 0
-            for pid, qty in items:
-                product = get_object_or_404(Product, pk=pid, is_active=True)
-                if product.stock < qty:
-                    transaction.set_rollback(True)
-                    messages.error(request, f'Insufficient stock for {product.name}')
-                    return redirect('pos')
-                product.stock -= qty
-                product.save()
-                line_price = product.price
-                SaleItem.objects.create(sale=sale, product=product, quantity=qty, price=line_price)
-                total += line_price * qty
-            sale.total = total
-            sale.save()
-            messages.success(request, f'Sale #{sale.id} recorded. Total: {total}')
-            return redirect('sales_list')
-
-    return render(request, 'core/pos.html', {'products': products})
+        try:
+            sale = checkout(request.user, items)
+        except UnknownProduct:
+            raise Http404('Product not available')
+        except CheckoutError as exc:
+            messages.error(request, str(exc))
+            return redirect('pos')
+        messages.success(request, f'Sale #{sale.id} recorded. Total: {sale.total}')
+        return redirect('sales_list')
+
+    return render(request, 'core/pos.html', {'categories': Category.objects.order_by('name')})
 
 @login_required
+@replica_reads
 def sales_list(request):
-    qs = Sale.objects.all().order_by('-created_at')
+    qs = (
+        Sale.objects
+        .select_related('seller')
+        .prefetch_related(Prefetch('items', queryset=SaleItem.objects.select_related('product').order_by('pk')))
+    )
     if not request.user.is_staff:
         qs = qs.filter(seller=request.user)
-    return render(request, 'core/sales_list.html', {'sales': qs})
+    try:
+        page = keyset_paginate(qs, after=request.GET.get('after'), before=request.GET.get('before'), per_page=SALES_PER_PAGE)
+    except InvalidCursor:
+        return redirect('sales_list')
+    return render(request, 'core/sales_list.html', {'sales': page, 'page': page})
+
+@login_required
+def receipt_pdf(request, pk):
+    qs = Sale.objects.select_related('seller')
+    if not request.user.is_staff:
+        qs = qs.filter(seller=request.user)
+    sale = get_object_or_404(qs, pk=pk)
+    return FileResponse(open(printing.receipt(sale), 'rb'), content_type='application/pdf', filename=f'receipt-{sale.pk}.pdf')
 
 # ----- Admin: Reports -----
 @admin_required
+@replica_reads
 def sales_report(request):
-    # Aggregate total sales per day and by seller
-    from django.db.models.functions import TruncDate
-    daily = (
-        Sale.objects
-        .annotate(day=TruncDate('created_at'))
-        .values('day')
-        .order_by('-day')
-        .annotate(total=models.Sum('total'), count=models.Count('id'))
+    query = _report_query(request)
+    data = {name: run() for name, run in _sales_report_queries(query).items()}
+    return render(request, 'core/reports.html', _report_context(query, data))
+
+@admin_required
+@replica_reads
+async def sales_report_async(request):
+    query = _report_query(request)
+    data = await gather_queries(_sales_report_queries(query))
+    return await sync_to_async(render)(request, 'core/reports.html', _report_context(query, data))
+
+def _report_query(request):
+    try:
+        return reports.ReportQuery.parse(request.GET)
+    except ValueError as exc:
+        messages.error(request, f'Invalid report filters: {exc}')
+        return reports.ReportQuery()
+
+def _sales_report_queries(query):
+    # The grouped and grand-total aggregates over the bounded range (cached per filter set) plus the small lookups for the form
+    return {
+        'report': lambda: get_or_build(query.cache_name(), (SALES,), lambda: reports.run(query)),
+        'sellers': lambda: list(User.objects.filter(is_active=True).order_by('username').values_list('id', 'username')),
+        'categories': lambda: list(Category.objects.order_by('name').values_list('id', 'name')),
+        'product': lambda: Product.objects.filter(pk=query.product).values_list('name', flat=True).first() if query.product else None,
+        'archived': lambda: reports.archived_months(query),
+    }
+
+def _report_context(query, data):
+    return {
+        **data,
+        'query': query,
+        'groupings': reports.GROUPINGS,
+        'group_label': reports.GROUPINGS[query.group],
+        'by_item': query.by_item,
+        'clear_product': urlencode(query.params(product=None)),
+        **data['report'],
+        'row_limit': reports.ROW_LIMIT,
+    }
+
+RESTOCK_LIMIT = 200
+
+@admin_required
+@replica_reads
+def restock_view(request):
+    # Written by `manage.py forecast_restock`; most urgent (least days of cover) first
+    qs = RestockSuggestion.objects.select_related('product', 'product__category')
+    suggestions = list(
+        qs.filter(suggested_quantity__gt=0)
+        .order_by(models.F('days_of_cover').asc(nulls_last=True), 'product__name')[:RESTOCK_LIMIT]
     )
-    by_seller = (
-        Sale.objects
-        .values('seller__username')
-        .order_by('seller__username')
-        .annotate(total=models.Sum('total'), count=models.Count('id'))
+    latest = qs.order_by('-computed_at').values_list('computed_at', flat=True).first()
+    return render(request, 'core/restock.html', {'suggestions': suggestions, 'computed_at': latest, 'limit': RESTOCK_LIMIT})
+
+LOW_STOCK_LIMIT = 200
+
+@admin_required
+@replica_reads
+def valuation_view(request):
+    # Both reads are small: one summary row per category and the low-stock partial index
+    categories = list(CategoryValuation.objects.select_related('category').order_by('-value'))
+    low = list(valuation.low_stock(LOW_STOCK_LIMIT))
+    return render(request, 'core/valuation.html', {
+        'categories': categories,
+        'total': sum(c.value for c in categories),
+        'units': sum(c.units for c in categories),
+        'low_stock': low,
+        'limit': LOW_STOCK_LIMIT,
+    })
+
+@admin_required
+@replica_reads
+def export_view(request, kind):
+    # ?format=csv|xlsx&start=YYYY-MM-DD&end=YYYY-MM-DD&seller=<user id>
+    fmt = request.GET.get('format', 'csv')
+    if kind not in exports.KINDS or fmt not in exports.FORMATS:
+        raise Http404('Unknown export')
+    try:
+        filters = exports.ExportFilters.parse(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid start, end or seller')
+    content_type, stream = exports.export_stream(kind, filters, fmt, using=read_alias())
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{timezone.localdate():%Y%m%d}.{fmt}"'
+    return response
+
+@admin_required
+def report_pdf(request):
+    # Same ?start=&end=&seller= filters as the exports; big ranges render on the worker pool
+    try:
+        filters = exports.ExportFilters.parse(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid start, end or seller')
+    inline = printing.report_size(filters) <= settings.PDF_INLINE_SALES
+    try:
+        path, ready = printing.report(filters, background=not inline)
+        if ready:
+            return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=f'sales-{timezone.localdate():%Y%m%d}.pdf')
+    except FileNotFoundError:
+        # A newer sale's report superseded this file between the check and the open; the reload renders that one
+        pass
+    except Exception:
+        # Rendering failed (inline or on the worker pool, which reports it once); the next request starts afresh
+        logger.exception('PDF report failed for %s', request.GET.urlencode())
+        return render(request, 'core/report_pending.html', {'failed': True}, status=500)
+    return render(request, 'core/report_pending.html', status=202)
+
+@admin_required
+def cache_stats(request):
+    return JsonResponse(cache_counters())
+
+def _metrics_token_ok(request):
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+def metrics_view(request):
+    # Staff session or the scraper's bearer token; numbers are per worker process
+    if not _metrics_token_ok(request):
+        return admin_required(_metrics_response)(request)
+    return _metrics_response(request)
+
+def _metrics_response(request):
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ----- Live dashboard events -----
+@admin_required
+async def events_view(request):
+    # Server-sent events need an ASGI server; 204 tells EventSource not to reconnect under WSGI
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(events.stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# ----- API: POS catalog -----
+CATALOG_PAGE_SIZE = 25
+CATALOG_MAX_PAGE_SIZE = 100
+
+def _int_param(request, name, default, lo, hi):
+    try:
+        return min(max(int(request.GET.get(name, default)), lo), hi)
+    except ValueError:
+        return default
+
+@login_required
+def catalog_api(request):
+    qs = Product.objects.filter(is_active=True)
+    term = request.GET.get('q', '').strip()
+    if term:
+        # Short terms match a name prefix (btree range scan); longer ones any substring (trigram index on Postgres)
+        qs = qs.filter(name__icontains=term) if len(term) >= 3 else qs.filter(name__istartswith=term)
+    category = request.GET.get('category')
+    if category:
+        qs = qs.filter(category_id=category) if category.isdigit() else qs.none()
+    page = _int_param(request, 'page', 1, 1, 10 ** 6)
+    size = _int_param(request, 'page_size', CATALOG_PAGE_SIZE, 1, CATALOG_MAX_PAGE_SIZE)
+
+    # One cheap aggregate decides whether the client's copy is still current; rows carry their
+    # category's name, so a renamed category counts as a change too
+    state = qs.aggregate(
+        count=models.Count('id'), last=models.Max('updated_at'), category_last=models.Max('category__updated_at'),
+    )
+    etag = '"%s"' % hashlib.md5(
+        f"{request.GET.urlencode()}|{state['count']}|{state['last']}|{state['category_last']}".encode()
+    ).hexdigest()
+    last = max(filter(None, (state['last'], state['category_last'])), default=None)
+    last_modified = int(last.timestamp()) if last else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    offset = (page - 1) * size
+    rows = list(
+        qs.order_by('name', 'id')
+        .values('id', 'name', 'price', 'stock', 'category_id', 'category__name')[offset:offset + size + 1]
     )
-    return render(request, 'core/reports.html', {'daily': daily, 'by_seller': by_seller})
+    response = JsonResponse({
+        'page': page,
+        'has_next': len(rows) > size,
+        'results': [
+            {
+                'id': r['id'], 'name': r['name'], 'price': str(r['price']), 'stock': r['stock'],
+                'category': r['category__name'], 'category_id': r['category_id'],
+            }
+            for r in rows[:size]
+        ],
+    })
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+# ----- API: barcode scans -----
+SCAN_MAX_CODES = 200
+
+@login_required
+def scan_api(request, code):
+    info = lookup.resolve([code]).get(code.strip())
+    if info is None:
+        return JsonResponse({'error': 'Unknown code'}, status=404)
+    return JsonResponse(info)
+
+@login_required
+@require_POST
+def scan_bulk_api(request):
+    # Body: {"codes": ["...", ...]}; unknown codes map to null
+    try:
+        codes = json.loads(request.body).get('codes')
+    except (ValueError, AttributeError):
+        codes = None
+    if not isinstance(codes, list) or not all(isinstance(c, str) for c in codes):
+        return JsonResponse({'error': 'Expected {"codes": [string, ...]}'}, status=400)
+    if len(codes) > SCAN_MAX_CODES:
+        return JsonResponse({'error': f'At most {SCAN_MAX_CODES} codes per call'}, status=400)
+    return JsonResponse({'results': lookup.resolve(codes)})
+
+# ----- API: offline till sync -----
+@seller_required
+@require_POST
+def sync_api(request):
+    # Body: {"sales": [{"id": "<uuid>", "lines": [{"product": id, "quantity": n}, ...]}, ...]}
+    try:
+        payload = json.loads(request.body)
+        results = sync.sync_sales(request.user, payload.get('sales') if isinstance(payload, dict) else None)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc) if isinstance(exc, sync.BatchError) else 'Invalid JSON'}, status=400)
+    return JsonResponse({'results': results})
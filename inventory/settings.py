@@ -1,13 +1,8 @@
 from pathlib import Path
-import pymysql
 from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
 
-# ------------------------------
-# MySQL support (if ever needed)
-# ------------------------------
-pymysql.install_as_MySQLdb()
-
 # ------------------------------
 # BASE DIRECTORY
 # ------------------------------
@@ -44,6 +39,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
 
+    # Per-view SQL/render timing, Server-Timing header and /metrics histograms
+    'core.middleware.InstrumentationMiddleware',
+
     # WhiteNoise for static files in production
     'whitenoise.middleware.WhiteNoiseMiddleware',
 
@@ -52,6 +50,8 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    # Read-your-writes for reports served from DATABASE_REPLICA_URL
+    'core.middleware.PrimaryPinMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -61,12 +61,24 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'inventory.urls'
 WSGI_APPLICATION = 'inventory.wsgi.application'
 
+# Serve the async dashboard/report views (concurrent aggregates); meant for ASGI deployments
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+
+# Requests slower than this are logged (logger core.slow) with their slowest queries
+SLOW_REQUEST_MS = config("SLOW_REQUEST_MS", default=500, cast=int)
+# Optional bearer token so a Prometheus scraper can read /metrics without a staff session
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Admin changelists on Postgres show the planner's row estimate for unfiltered tables larger than this
+ADMIN_ESTIMATED_COUNT_ABOVE = config("ADMIN_ESTIMATED_COUNT_ABOVE", default=10000, cast=int)
+
 # ------------------------------
 # TEMPLATES
 # ------------------------------
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Stock Django templates, with render time reported to core.metrics
+        'BACKEND': 'core.templating.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'core' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,9 +97,13 @@ TEMPLATES = [
 # ------------------------------
 DATABASE_URL = config("DATABASE_URL", default=None)
 
+# Persistent connections, checked before reuse so a restarted server doesn't surface as a failed request
+DB_CONN_MAX_AGE = config("DB_CONN_MAX_AGE", default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool)
+
 if DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL)
+        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=DB_CONN_HEALTH_CHECKS)
     }
 else:
     DATABASES = {
@@ -98,9 +114,100 @@ else:
             'PASSWORD': config("DB_PASSWORD", default=""),
             'HOST': config("DB_HOST", default="localhost"),
             'PORT': config("DB_PORT", default="5432"),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
         }
     }
 
+# Optional read replica for reports, exports and dashboard aggregates (core.routing)
+DATABASE_REPLICA_URL = config("DATABASE_REPLICA_URL", default=None)
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
+    # Tests read the replica through the primary's test database; REPLICA_TEST_MIRROR=False gives it
+    # a test database of its own instead, so the routing tests can tell the two apart
+    if config("REPLICA_TEST_MIRROR", default=True, cast=bool):
+        DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# MySQL only: load a driver when a MySQL URL is actually configured, preferring mysqlclient over PyMySQL
+if any(db['ENGINE'] == 'django.db.backends.mysql' for db in DATABASES.values()):
+    try:
+        import MySQLdb  # noqa: F401
+    except ImportError:
+        import pymysql
+        pymysql.install_as_MySQLdb()
+
+DATABASE_ROUTERS = ['core.routing.ReplicaRouter']
+# Seconds a browser keeps reading from the primary after it wrote something (covers replica lag)
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=10, cast=int)
+
+# ------------------------------
+# CACHE (CACHE_URL: locmem://, file:///path/to/dir or redis://host:port/db)
+# ------------------------------
+CACHE_URL = config("CACHE_URL", default="locmem://")
+CACHE_TTL = config("CACHE_TTL", default=60, cast=int)
+CACHE_MAX_ENTRIES = config("CACHE_MAX_ENTRIES", default=1000, cast=int)
+
+if CACHE_URL.startswith("redis"):
+    # RedisCache only imports its client on first use, so fail here rather than on every request;
+    # the client stays out of requirements.txt for deployments that never use Redis
+    try:
+        import redis  # noqa: F401
+    except ImportError as exc:
+        raise ImproperlyConfigured("CACHE_URL is a Redis URL but the redis package is not installed (pip install redis)") from exc
+    # Redis evicts by its own maxmemory policy
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+        'TIMEOUT': CACHE_TTL,
+    }}
+elif CACHE_URL.startswith("file://"):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_URL[len("file://"):],
+        'TIMEOUT': CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    }}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory',
+        'TIMEOUT': CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    }}
+
+# Whether every worker and instance sees the same cache (Redis does; locmem is per process, a
+# file:// directory per host). Cached sessions and users are only safe on a shared cache: a logout,
+# demotion or deactivation must reach every worker on the user's next request.
+CACHE_SHARED = config("CACHE_SHARED", default=CACHE_URL.startswith("redis"), cast=bool)
+
+# With a shared cache, sessions are read from it and written through to the database, so a till
+# request normally costs no session query
+SESSION_ENGINE = config(
+    "SESSION_ENGINE",
+    default="django.contrib.sessions.backends.cached_db" if CACHE_SHARED else "django.contrib.sessions.backends.db",
+)
+
+# Reorder level given to new products (each product's own level drives low-stock alerts),
+# and the poll/LISTEN timeout of the live dashboard events source thread (core.events)
+LOW_STOCK_THRESHOLD = config("LOW_STOCK_THRESHOLD", default=5, cast=int)
+EVENTS_POLL_SECONDS = config("EVENTS_POLL_SECONDS", default=2, cast=float)
+
+# Off Postgres and SQLite, fold_stock only folds movements older than this, so a stock change
+# whose transaction commits late is never skipped (core.stock)
+STOCK_FOLD_LAG = config("STOCK_FOLD_LAG", default=300, cast=int)
+
+# Per-process cache of the logged-in user (core.backends), used with a shared cache only; edits
+# invalidate it everywhere via the shared USERS version, the TTL bounds how long an entry lives
+USER_CACHE_SIZE = config("USER_CACHE_SIZE", default=1024, cast=int)
+USER_CACHE_TTL = config("USER_CACHE_TTL", default=30, cast=int)
+
+# Per-process LRU for barcode scans (core.lookup); product edits evict it everywhere via the
+# shared PRODUCTS version, the TTL bounds staleness when CACHE_URL is per-process (locmem)
+SCAN_CACHE_SIZE = config("SCAN_CACHE_SIZE", default=2048, cast=int)
+SCAN_CACHE_TTL = config("SCAN_CACHE_TTL", default=30, cast=int)
+
 # ------------------------------
 # PASSWORD VALIDATORS
 # ------------------------------
@@ -132,9 +239,21 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Gzipped CSVs of archived months (manage.py archive_sales)
+ARCHIVE_DIR = config("ARCHIVE_DIR", default=str(BASE_DIR / 'archive'))
+
+# Content-addressed PDF receipts and reports; reports covering more than
+# PDF_INLINE_SALES sales are rendered by a pool of PDF_WORKERS threads
+PDF_CACHE_DIR = config("PDF_CACHE_DIR", default=str(BASE_DIR / 'pdf_cache'))
+PDF_WORKERS = config("PDF_WORKERS", default=2, cast=int)
+PDF_INLINE_SALES = config("PDF_INLINE_SALES", default=500, cast=int)
+
 # ------------------------------
 # AUTH REDIRECTS
 # ------------------------------
+AUTHENTICATION_BACKENDS = [
+    'core.backends.CachedModelBackend' if CACHE_SHARED else 'django.contrib.auth.backends.ModelBackend',
+]
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
@@ -150,6 +269,16 @@ EMAIL_HOST_USER = config("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="webmaster@localhost")
 
+# ------------------------------
+# LOGGING
+# ------------------------------
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'core': {'handlers': ['console'], 'level': config("CORE_LOG_LEVEL", default="INFO")}},
+}
+
 # ------------------------------
 # DEFAULT PRIMARY KEY
 # ------------------------------
@@ -1,4 +1,5 @@
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from core import views
@@ -8,7 +9,7 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
 
-    path('', views.dashboard, name='dashboard'),
+    path('', views.dashboard_async if settings.ASYNC_VIEWS else views.dashboard, name='dashboard'),
 
     # Admin/Owner
     path('categories/', views.category_list, name='category_list'),
@@ -18,6 +19,7 @@ urlpatterns = [
 
     path('products/', views.product_list, name='product_list'),
     path('products/new/', views.product_create, name='product_create'),
+    path('products/import/', views.product_import, name='product_import'),
     path('products/<int:pk>/edit/', views.product_edit, name='product_edit'),
     path('products/<int:pk>/delete/', views.product_delete, name='product_delete'),
 
@@ -26,9 +28,21 @@ urlpatterns = [
     path('users/<int:pk>/edit/', views.user_edit, name='user_edit'),
     path('users/<int:pk>/delete/', views.user_delete, name='user_delete'),
 
-    path('reports/sales/', views.sales_report, name='sales_report'),
+    path('reports/sales/', views.sales_report_async if settings.ASYNC_VIEWS else views.sales_report, name='sales_report'),
+    path('reports/restock/', views.restock_view, name='restock'),
+    path('reports/valuation/', views.valuation_view, name='valuation'),
+    path('reports/sales.pdf', views.report_pdf, name='report_pdf'),
+    path('reports/cache/', views.cache_stats, name='cache_stats'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('exports/<str:kind>/', views.export_view, name='export'),
 
     # Seller
     path('pos/', views.pos_view, name='pos'),
     path('sales/', views.sales_list, name='sales_list'),
+    path('sales/<int:pk>/receipt.pdf', views.receipt_pdf, name='receipt_pdf'),
+    path('api/catalog/', views.catalog_api, name='catalog_api'),
+    path('api/scan/', views.scan_bulk_api, name='scan_bulk_api'),
+    path('api/scan/<str:code>/', views.scan_api, name='scan_api'),
+    path('api/sync/', views.sync_api, name='sync_api'),
+    path('api/events/', views.events_view, name='events'),
 ]